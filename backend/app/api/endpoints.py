@@ -1,9 +1,12 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel
+from typing_extensions import TypedDict
 from typing import List, Dict, Optional
 from app.services.master_builder import MasterBuilder
-from app.api.lego_build_endpoint import router as lego_build_router
+import asyncio
+import shutil
+import sys
 import tempfile
 import os
 
@@ -17,9 +20,47 @@ except ImportError:
 
 router = APIRouter(prefix="/api", tags=["API"])
 
+# Read uploads 1 MiB at a time instead of buffering the whole video in RAM
+UPLOAD_CHUNK_SIZE = 1 << 20
 
-class VoxelInput(BaseModel):
-    """Input voxel data from Three.js"""
+
+def _sendfile_copy(src, dst) -> int:
+    """Copy a disk-backed file into dst inside the kernel (no user-space buffers)"""
+    src.flush()
+    in_fd, out_fd = src.fileno(), dst.fileno()
+    size = os.fstat(in_fd).st_size
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(out_fd, in_fd, offset, size - offset)
+        if sent == 0:
+            break
+        offset += sent
+    return offset
+
+
+def _copy_upload(src, dst) -> int:
+    """
+    Copy an upload's file object into dst; returns the number of bytes copied.
+    
+    On Linux the upload is copied fd-to-fd with sendfile (other platforms only
+    allow a socket as the destination). File objects without a real file
+    descriptor (fileno() raises io.UnsupportedOperation, an OSError) and any
+    sendfile failure take the chunked copy instead.
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            return _sendfile_copy(src, dst)
+        except OSError:
+            # Drop whatever sendfile managed to write before retrying in chunks
+            dst.seek(0)
+            dst.truncate()
+    src.seek(0)
+    shutil.copyfileobj(src, dst, UPLOAD_CHUNK_SIZE)
+    return dst.tell()
+
+
+class VoxelInput(TypedDict):
+    """Input voxel data from Three.js (validated straight into a plain dict)"""
     x: int
     y: int
     z: int
@@ -52,15 +93,11 @@ async def upload_video(file: UploadFile = File(...)):
         if not file.content_type or not file.content_type.startswith('video/'):
             raise HTTPException(status_code=400, detail="File must be a video")
         
-        # Save to temporary file
+        # Stream to temporary file in chunks so memory stays O(chunk), not O(file)
         with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
+            file_size = await asyncio.to_thread(_copy_upload, file.file, tmp_file)
             tmp_path = tmp_file.name
-        
-        # Get file size
-        file_size = len(content)
-        
+
         return JSONResponse({
             "status": "success",
             "message": "Video uploaded successfully",
@@ -76,8 +113,8 @@ async def upload_video(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Error uploading video: {str(e)}")
 
 
-@router.post("/master-builder/process")
-async def process_voxels(request: ProcessVoxelsRequest) -> Dict:
+@router.post("/master-builder/process", response_model=None)
+async def process_voxels(request: ProcessVoxelsRequest) -> ORJSONResponse:
     """
     Process voxel data and generate MasterManifest with LEGO bricks.
     
@@ -95,21 +132,11 @@ async def process_voxels(request: ProcessVoxelsRequest) -> Dict:
     try:
         builder = MasterBuilder()
         
-        # Convert Pydantic models to dicts
-        voxel_data = [
-            {
-                "x": voxel.x,
-                "y": voxel.y,
-                "z": voxel.z,
-                "hex_color": voxel.hex_color
-            }
-            for voxel in request.voxels
-        ]
-        
         # Process voxels and generate manifest (async)
-        manifest = await builder.process_voxels(voxel_data)
+        manifest = await builder.process_voxels(request.voxels)
         
-        return manifest
+        # Serialize the manifest with orjson in one pass (no jsonable_encoder walk)
+        return ORJSONResponse(manifest)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing voxels: {str(e)}")
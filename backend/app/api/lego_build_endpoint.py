@@ -10,10 +10,15 @@ Main entry point that:
 6. Minimizes variety in future creations through intelligent reuse
 """
 
+import asyncio
 import logging
+import os
+import threading
 from typing import List, Dict, Optional
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Query
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
+from typing_extensions import TypedDict
 
 from app.services.master_builder import MasterBuilder
 from app.services.backboard_lego_memory import BackboardLegoMemory, LegoBuildOrchestrator
@@ -24,16 +29,22 @@ from app.services.instruction_manual_generator import InstructionManualGenerator
 logger = logging.getLogger(__name__)
 
 # Initialize routers
-router = APIRouter(prefix="/api/lego", tags=["lego_build"])
+# Manifests carry every brick, voxel and step, so encode them with orjson
+router = APIRouter(prefix="/api/lego", tags=["lego_build"], default_response_class=ORJSONResponse)
 
 # Global instances (in production, use dependency injection)
 _backboard_memory: Optional[BackboardLegoMemory] = None
 _orchestrator: Optional[LegoBuildOrchestrator] = None
+_init_lock = threading.Lock()
+
+# Cap concurrent greedy builds at the core count; extra requests queue here
+# instead of oversubscribing the worker thread pool
+_BUILD_SEMAPHORE = asyncio.Semaphore(os.cpu_count() or 1)
 
 
 # Request/Response Models
-class VoxelData(BaseModel):
-    """Single voxel from Three.js"""
+class VoxelData(TypedDict):
+    """Single voxel from Three.js (validated straight into a plain dict)"""
     x: int
     y: int
     z: int
@@ -92,22 +103,49 @@ class LegoManifestResponse(BaseModel):
     piece_count: Dict
     estimated_cost: float
     recommendations: List[ComponentRecommendation]
+    instruction_manual: Optional[Dict] = None
+    next_offset: Optional[int] = None  # Set when bricks were truncated; page via /builds/{id}/bricks
+    next_step_offset: Optional[int] = None  # Set when steps were truncated; page via /builds/{id}/steps
 
 
-def init_lego_services(user_id: str = "default"):
-    """Initialize LEGO services on startup"""
+def init_lego_services(user_id: str = "default") -> BackboardLegoMemory:
+    """
+    Initialize LEGO services on startup.
+    
+    Idempotent: later calls (the lazy per-request fallbacks) return the
+    existing memory instead of replacing it and dropping saved builds.
+    """
     global _backboard_memory, _orchestrator
     
-    logger.info(f"Initializing LEGO services for user {user_id}")
+    with _init_lock:
+        if _backboard_memory is None:
+            logger.info(f"Initializing LEGO services for user {user_id}")
+            _backboard_memory = BackboardLegoMemory(user_id=user_id)
+            _orchestrator = LegoBuildOrchestrator(user_id=user_id)
     
-    _backboard_memory = BackboardLegoMemory(user_id=user_id)
-    _orchestrator = LegoBuildOrchestrator(user_id=user_id)
+    return _backboard_memory
+
+
+def _page(items: List, offset: int, limit: int):
+    """Slice one page out of items; returns (page, next_offset or None when done)"""
+    end = offset + limit
+    return items[offset:end], (end if end < len(items) else None)
 
 
-@router.post("/build/from-threejs", response_model=LegoManifestResponse)
+@router.post(
+    "/build/from-threejs",
+    response_model=None,
+    responses={200: {"model": LegoManifestResponse}},
+)
 async def generate_lego_build_from_threejs(
-    input_data: ThreeJsVoxelInput = Body(..., description="Three.js voxel data")
-) -> Dict:
+    input_data: ThreeJsVoxelInput = Body(..., description="Three.js voxel data"),
+    bricks_limit: Optional[int] = Query(
+        None, ge=0, description="Page size for inline bricks and steps; omit for the full build"
+    ),
+    include_voxel_coverage: Optional[bool] = Query(
+        None, description="Include the per-voxel coverage map (default: only when not paging)"
+    )
+) -> ORJSONResponse:
     """
     Generate LEGO build from Three.js voxel data.
     
@@ -128,9 +166,18 @@ async def generate_lego_build_from_threejs(
     
     Args:
         input_data: Three.js voxel input
+        bricks_limit: Opt in to paging. When set, only the first bricks_limit
+            bricks and instruction step summaries (no per-step brick lists) are
+            embedded; the rest are paged through GET /builds/{build_id}/bricks
+            and /steps from next_offset / next_step_offset. Omitted, the full
+            build is returned as before.
+        include_voxel_coverage: Embed the voxel coverage map (one row per voxel);
+            defaults to true without paging and false with it
         
     Returns:
-        Detailed LEGO manifest with recommendations
+        Detailed LEGO manifest with recommendations, shaped as LegoManifestResponse.
+        The dict is built to that contract here and encoded directly, without a
+        second pydantic validation/serialization pass over every brick.
     """
     
     try:
@@ -141,29 +188,25 @@ async def generate_lego_build_from_threejs(
         if _backboard_memory is None:
             init_lego_services(input_data.user_id)
         
-        # Convert Three.js voxels to format MasterBuilder expects
-        voxel_data = [
-            {
-                "x": v.x,
-                "y": v.y,
-                "z": v.z,
-                "hex_color": v.hex_color
-            }
-            for v in input_data.voxels
-        ]
+        # Voxels are validated as plain dicts, already in the format MasterBuilder expects
+        voxel_data = input_data.voxels
         
         # Step 1: Generate build with MasterBuilder (greedy algorithm)
+        # Blocking CPU work runs in a worker thread so the event loop stays free
         logger.info("Step 1: Running Greedy algorithm")
         master_builder = MasterBuilder()
-        manifest = master_builder.process_voxels_sync(voxel_data)
-        
-        # Get piece count and cost
-        piece_summary = master_builder.get_piece_count()
-        logger.info(f"Step 2: Piece count complete - {piece_summary.total_pieces} total pieces")
-        
-        # Generate instruction manual
-        logger.info("Step 2.5: Generating instruction manual")
-        build_guide = InstructionManualGenerator.generate_build_guide(manifest, input_data.project_name)
+        async with _BUILD_SEMAPHORE:
+            manifest = await asyncio.to_thread(master_builder.process_voxels_sync, voxel_data)
+            
+            # Get piece count and cost
+            piece_summary = await asyncio.to_thread(master_builder.get_piece_count)
+            logger.info(f"Step 2: Piece count complete - {piece_summary.total_pieces} total pieces")
+            
+            # Generate instruction manual
+            logger.info("Step 2.5: Generating instruction manual")
+            build_guide = await asyncio.to_thread(
+                InstructionManualGenerator.generate_build_guide, manifest, input_data.project_name
+            )
         logger.info(f"Generated {build_guide.total_steps} instruction steps")
         
         # Step 2: Query hardcoded database for component references
@@ -202,7 +245,8 @@ async def generate_lego_build_from_threejs(
         
         # Step 5: Save to Backboard memory
         logger.info("Step 5: Saving build to Backboard memory")
-        build_id = _backboard_memory.save_build(
+        build_id = await asyncio.to_thread(
+            _backboard_memory.save_build,
             project_name=input_data.project_name,
             voxel_data={
                 "voxel_count": len(input_data.voxels),
@@ -222,21 +266,8 @@ async def generate_lego_build_from_threejs(
         # Step 6: Build response
         logger.info(f"Step 6: Building response for build {build_id}")
         
-        # Convert build guide steps to dict format
-        build_steps = [
-            {
-                "step_number": step.step_number,
-                "layer_z": step.layer_z,
-                "bricks_in_step": step.bricks_in_step,
-                "piece_counts": step.piece_counts,
-                "instructions": step.instructions
-            }
-            for step in build_guide.steps
-        ]
-        
-        # Calculate baseplate size
-        max_x = max([brick["position"]["studs"][0] + brick["dimensions"]["studs"]["width"] for brick in manifest.get("bricks", [])], default=0)
-        max_y = max([brick["position"]["studs"][1] + brick["dimensions"]["studs"]["depth"] for brick in manifest.get("bricks", [])], default=0)
+        # Calculate baseplate size (footprint bounds come precomputed from MasterBuilder)
+        max_x, max_y = manifest.get("bounds", {}).get("studs", [0, 0])
         baseplate_info = {
             "size_studs": [max_x + 2, max_y + 2],  # Add 2 studs padding
             "size_mm": [(max_x + 2) * 8, (max_y + 2) * 8],
@@ -246,6 +277,21 @@ async def generate_lego_build_from_threejs(
             "quantity": 1
         }
         
+        # BuildStep/PieceCount dataclasses are passed through as-is; orjson encodes
+        # them natively, so no per-item dicts are built here.
+        # Full manifest is kept in Backboard memory. When paging, only the first page
+        # of bricks and of step summaries is inlined: full steps repeat every brick.
+        bricks = manifest.get("bricks", [])
+        steps = build_guide.steps
+        next_offset = next_step_offset = None
+        if bricks_limit is not None:
+            bricks, next_offset = _page(bricks, 0, bricks_limit)
+            steps, next_step_offset = _page(
+                InstructionManualGenerator.export_to_json(build_guide, include_bricks=False)["steps"],
+                0, bricks_limit
+            )
+        if include_voxel_coverage is None:
+            include_voxel_coverage = bricks_limit is None
         response = {
             "build_id": build_id,
             "project_name": input_data.project_name,
@@ -253,24 +299,16 @@ async def generate_lego_build_from_threejs(
             "generation_date": manifest.get("generation_metadata", {}).get("generation_date", ""),
             "total_bricks": manifest.get("total_bricks", 0),
             "manifest_version": manifest.get("manifest_version", "2.0"),
-            "bricks": manifest.get("bricks", []),
+            "bricks": bricks,
             "inventory": manifest.get("inventory", []),
             "layers": manifest.get("layers", {}),
-            "voxel_coverage": manifest.get("voxel_coverage", []),
+            "voxel_coverage": manifest.get("voxel_coverage", []) if include_voxel_coverage else [],
             "generation_metadata": manifest.get("generation_metadata", {}),
             "seam_map": manifest.get("seam_map", []),
             "piece_count": {
                 "total_pieces": piece_summary.total_pieces,
                 "total_unique": piece_summary.total_unique_pieces,
-                "breakdown": [
-                    {
-                        "part_id": pc.part_id,
-                        "color_id": pc.color_id,
-                        "quantity": pc.quantity,
-                        "piece_name": pc.piece_name
-                    }
-                    for pc in piece_summary.piece_counts[:20]  # Top 20
-                ]
+                "breakdown": piece_summary.piece_counts[:20]  # Top 20 PieceCount dataclasses
             },
             "estimated_cost": piece_summary.estimated_cost,
             "recommendations": recommendations,
@@ -279,13 +317,15 @@ async def generate_lego_build_from_threejs(
                 "difficulty": build_guide.difficulty,
                 "estimated_time_minutes": build_guide.estimated_time_minutes,
                 "baseplate": baseplate_info,
-                "steps": build_steps,
+                "steps": steps,  # BuildStep dataclasses, or summaries when paging
                 "layer_summary": build_guide.layer_summary
-            }
+            },
+            "next_offset": next_offset,
+            "next_step_offset": next_step_offset
         }
         
         logger.info(f"Successfully generated build {build_id}: {input_data.project_name}")
-        return response
+        return ORJSONResponse(response)
     
     except Exception as e:
         logger.error(f"Error generating LEGO build: {str(e)}", exc_info=True)
@@ -312,6 +352,74 @@ async def get_build(build_id: str) -> Dict:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/builds/{build_id}/bricks")
+async def get_build_bricks(
+    build_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1)
+) -> Dict:
+    """Page through the bricks of a saved build"""
+    try:
+        if _backboard_memory is None:
+            init_lego_services()
+        
+        build = _backboard_memory.get_build(build_id)
+        if not build:
+            raise HTTPException(status_code=404, detail=f"Build {build_id} not found")
+        
+        bricks = build.manifest.get("bricks", [])
+        page, next_offset = _page(bricks, offset, limit)
+        return {
+            "build_id": build_id,
+            "total_bricks": len(bricks),
+            "offset": offset,
+            "bricks": page,
+            "next_offset": next_offset
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving build bricks: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/builds/{build_id}/steps")
+async def get_build_steps(
+    build_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1)
+) -> Dict:
+    """Page through the instruction step summaries of a saved build (bricks via /bricks)"""
+    try:
+        if _backboard_memory is None:
+            init_lego_services()
+        
+        build = _backboard_memory.get_build(build_id)
+        if not build:
+            raise HTTPException(status_code=404, detail=f"Build {build_id} not found")
+        
+        # Steps are derived from the stored manifest, so regenerate rather than store them
+        build_guide = await asyncio.to_thread(
+            InstructionManualGenerator.generate_build_guide, build.manifest, build.project_name
+        )
+        steps = InstructionManualGenerator.export_to_json(build_guide, include_bricks=False)["steps"]
+        page, next_offset = _page(steps, offset, limit)
+        return {
+            "build_id": build_id,
+            "total_steps": len(steps),
+            "offset": offset,
+            "steps": page,
+            "next_offset": next_offset
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving build steps: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/builds/room/{room_type}")
 async def get_builds_by_room(room_type: str) -> List[Dict]:
     """Get all builds for a specific room type"""
@@ -64,7 +64,8 @@ def bb_coin_memo_payload(req: MemoPayloadRequest) -> MemoPayloadResponse:
         estimated_cost=cost,
     )
     payload = build_memo_payload(metadata)
-    return MemoPayloadResponse(memoPayload=payload, metadata=metadata)
+    # Both fields come from our own builders; skip re-validating them on construction
+    return MemoPayloadResponse.model_construct(memoPayload=payload, metadata=metadata)
 
 
 @router.get("/bb-coin/info")
@@ -5,24 +5,40 @@ Transfer Three.js scene data through Backboard's LEGO system:
 Three.js → Voxelizer → Greedy Algorithm → LEGO Manifest → Backboard Memory
 """
 
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Optional
+import asyncio
+from concurrent.futures import Executor
+from functools import lru_cache
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import Any, Iterator, List, Dict, Optional, Union
 from pydantic import BaseModel
+import orjson
 
-from app.services.threejs_voxelizer import convert_threejs_to_voxels, get_sample_dorm_room_voxels
+from app.services.threejs_voxelizer import (
+    VoxelSet,
+    convert_threejs_to_voxel_set,
+    get_sample_dorm_room_voxels,
+)
 from app.services.backboard_lego_memory import BackboardLegoMemory
 from app.services.master_builder import MasterBuilder
 
-router = APIRouter(prefix="/api/lego", tags=["LEGO Build"])
+router = APIRouter(prefix="/api/lego", tags=["LEGO Build"], default_response_class=ORJSONResponse)
 
-# Global services (initialized at startup)
-_backboard_memory: Optional[BackboardLegoMemory] = None
-_master_builder: Optional[MasterBuilder] = None
+# Largest scene accepted by /threejs-to-backboard (checked before voxelizing)
+MAX_SCENE_OBJECTS = 10_000
+# Voxels per streamed chunk of the pipeline response body
+STREAM_VOXEL_BATCH = 2048
+# Same orjson options ORJSONResponse renders with (manifests have int keys)
+_STREAM_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
 
 
 class ThreeJsSceneInput(BaseModel):
     """Three.js scene as JSON"""
-    objects: List[Dict]  # Scene objects with type, position, dimensions, color
+    # Scene objects with type, position, dimensions, color. List[Any] keeps pydantic
+    # from copying every object dict (the voxelizer reads them with .get() anyway);
+    # the endpoint checks they are objects with _require_dicts
+    objects: List[Any]
     project_name: str = "three-js-project"
     room_type: str = "room"
     resolution: float = 0.15  # Voxel resolution in meters
@@ -30,7 +46,7 @@ class ThreeJsSceneInput(BaseModel):
 
 class VoxelGridInput(BaseModel):
     """Already-voxelized input"""
-    voxels: List[Dict]  # [{x, y, z, hex_color}, ...]
+    voxels: List[Any]  # [{x, y, z, hex_color}, ...], passed through like objects
     project_name: str = "voxel-project"
     room_type: str = "room"
 
@@ -44,12 +60,117 @@ class PipelineResponse(BaseModel):
     recommendations: List[Dict]
 
 
+def _iter_pipeline_json(voxels: List[Dict], manifest: Dict, backboard_saved: bool,
+                        recommendations: List[Dict]) -> Iterator[bytes]:
+    """Encode a PipelineResponse-shaped body piecewise, STREAM_VOXEL_BATCH voxels at a time"""
+    yield b'{"status":"success","voxels":['
+    for start in range(0, len(voxels), STREAM_VOXEL_BATCH):
+        chunk = orjson.dumps(voxels[start:start + STREAM_VOXEL_BATCH], option=_STREAM_JSON_OPTIONS)[1:-1]
+        yield chunk if start == 0 else b"," + chunk
+    yield b'],"manifest":' + orjson.dumps(manifest, option=_STREAM_JSON_OPTIONS)
+    yield (
+        b',"backboard_saved":' + orjson.dumps(backboard_saved, option=_STREAM_JSON_OPTIONS)
+        + b',"recommendations":' + orjson.dumps(recommendations, option=_STREAM_JSON_OPTIONS) + b"}"
+    )
+
+
+def _require_dicts(items: List[Any], field: str):
+    """422 unless every item is a JSON object (the models skip per-item validation)"""
+    if all(type(item) is dict for item in items):
+        return
+    index, item = next((i, item) for i, item in enumerate(items) if not isinstance(item, dict))
+    raise HTTPException(
+        status_code=422, detail=f"{field}[{index}] must be an object, got {type(item).__name__}"
+    )
+
+
+def get_backboard_memory(request: Request) -> BackboardLegoMemory:
+    """Shared Backboard memory, stored on app.state at startup (see init_threejs_services)"""
+    backboard_memory = getattr(request.app.state, "backboard_memory", None)
+    if backboard_memory is None:
+        raise HTTPException(status_code=503, detail="Services not initialized")
+    return backboard_memory
+
+
+def get_build_pool(request: Request) -> Optional[Executor]:
+    """Process pool for greedy builds, if one was configured at startup"""
+    return getattr(request.app.state, "build_pool", None)
+
+
+def init_build_worker():
+    """Process pool initializer: import the builder once per worker, not per task"""
+    import app.services.master_builder  # noqa: F401
+
+
+def _build_manifest(voxels: Union[List[Dict], VoxelSet]) -> Dict:
+    """Greedy build in a fresh MasterBuilder (module-level so it pickles into pool workers)"""
+    return MasterBuilder().process_voxels_sync(voxels)
+
+
+async def _run_pipeline(backboard_memory: BackboardLegoMemory, voxels: Union[List[Dict], VoxelSet],
+                        project_name: str, room_type: str,
+                        build_pool: Optional[Executor] = None) -> StreamingResponse:
+    """
+    Greedy build → Backboard save → recommendations, shared by the pipeline endpoints.
+    
+    Blocking work runs in worker threads so the event loop keeps serving other
+    requests. MasterBuilder keeps per-build state, so each request gets its own;
+    with a build_pool the CPU-bound greedy build runs in another process instead,
+    so concurrent builds are not serialized by the GIL (VoxelSet columns pickle
+    cheaply).
+    Recommendations only depend on project name and room type, so they are looked
+    up alongside the greedy build (against builds saved before this one).
+    The result is streamed straight from the dicts we built (shaped as
+    PipelineResponse) rather than re-validated voxel by voxel or encoded into one
+    large buffer. Voxelized scenes arrive as a VoxelSet and only become dicts
+    here, for the JSON body.
+    """
+    # Generate LEGO manifest using process_voxels_sync, and get recommendations
+    # from Backboard (entries already carry project_name, similarity and brick_count)
+    if build_pool is not None:
+        build = asyncio.get_running_loop().run_in_executor(build_pool, _build_manifest, voxels)
+    else:
+        build = asyncio.to_thread(_build_manifest, voxels)
+    manifest, recommendations = await asyncio.gather(
+        build,
+        asyncio.to_thread(
+            backboard_memory.get_similar_builds,
+            project_name=project_name,
+            room_type=room_type,
+            max_results=3
+        )
+    )
+    
+    if isinstance(voxels, VoxelSet):
+        voxels = voxels.to_dicts()
+    
+    # Save to Backboard
+    build_id = await asyncio.to_thread(
+        backboard_memory.save_build,
+        project_name=project_name,
+        voxel_data={"voxel_count": len(voxels), "voxels": voxels[:100]},
+        manifest=manifest,
+        piece_summary={"total_pieces": manifest.get("total_bricks", 0)},
+        components=manifest.get("evolved_components", []),
+        room_type=room_type
+    )
+    
+    return StreamingResponse(
+        _iter_pipeline_json(voxels, manifest, bool(build_id), recommendations),
+        media_type="application/json"
+    )
+
+
 # ============================================================================
 # PIPELINE ENDPOINTS
 # ============================================================================
 
-@router.post("/threejs-to-backboard", response_model=PipelineResponse)
-async def threejs_to_backboard(scene_input: ThreeJsSceneInput) -> PipelineResponse:
+@router.post("/threejs-to-backboard", response_model=None, responses={200: {"model": PipelineResponse}})
+async def threejs_to_backboard(
+    scene_input: ThreeJsSceneInput,
+    backboard_memory: BackboardLegoMemory = Depends(get_backboard_memory),
+    build_pool: Optional[Executor] = Depends(get_build_pool)
+) -> StreamingResponse:
     """
     Complete pipeline: Three.js → Voxels → LEGO → Backboard
     
@@ -75,98 +196,53 @@ async def threejs_to_backboard(scene_input: ThreeJsSceneInput) -> PipelineRespon
     }
     """
     try:
-        if not _master_builder or not _backboard_memory:
-            raise HTTPException(status_code=503, detail="Services not initialized")
+        if len(scene_input.objects) > MAX_SCENE_OBJECTS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Scene has {len(scene_input.objects)} objects (max {MAX_SCENE_OBJECTS})"
+            )
+        _require_dicts(scene_input.objects, "objects")
         
         # Step 1: Convert Three.js to voxels
-        voxels = convert_threejs_to_voxels(scene_input.dict(), scene_input.resolution)
+        # The voxelizer only reads "objects"; hand it the parsed list instead of dumping the model
+        voxels = await asyncio.to_thread(
+            convert_threejs_to_voxel_set, {"objects": scene_input.objects}, scene_input.resolution
+        )
         
         if not voxels:
             raise HTTPException(status_code=400, detail="No voxels generated from scene")
         
-        # Step 2: Generate LEGO manifest using process_voxels_sync
-        manifest = _master_builder.process_voxels_sync(voxels)
-        
-        # Step 3: Save to Backboard
-        saved = _backboard_memory.save_build(
-            project_name=scene_input.project_name,
-            room_type=scene_input.room_type,
-            voxels=voxels,
-            manifest=manifest
-        )
-        
-        # Step 4: Get recommendations from Backboard
-        similar_builds = _backboard_memory.get_similar_builds(
-            project_name=scene_input.project_name,
-            room_type=scene_input.room_type,
-            max_results=3
-        )
-        
-        recommendations = []
-        for build in similar_builds:
-            recommendations.append({
-                "project_name": build.get("project_name"),
-                "similarity": build.get("similarity", 0.8),
-                "brick_count": len(build.get("manifest", {}).get("bricks", []))
-            })
-        
-        return PipelineResponse(
-            status="success",
-            voxels=voxels,
-            manifest=manifest,
-            backboard_saved=saved,
-            recommendations=recommendations
+        # Steps 2-4: LEGO manifest, Backboard save, recommendations
+        return await _run_pipeline(
+            backboard_memory, voxels, scene_input.project_name, scene_input.room_type, build_pool
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/voxels-to-backboard", response_model=PipelineResponse)
-async def voxels_to_backboard(voxel_input: VoxelGridInput) -> PipelineResponse:
+@router.post("/voxels-to-backboard", response_model=None, responses={200: {"model": PipelineResponse}})
+async def voxels_to_backboard(
+    voxel_input: VoxelGridInput,
+    backboard_memory: BackboardLegoMemory = Depends(get_backboard_memory),
+    build_pool: Optional[Executor] = Depends(get_build_pool)
+) -> StreamingResponse:
     """
     Process already-voxelized data through Backboard.
     
     Skips the Three.js conversion step if you already have voxels.
     """
     try:
-        if not _master_builder or not _backboard_memory:
-            raise HTTPException(status_code=503, detail="Services not initialized")
-        
-        # Step 1: Generate LEGO manifest using process_voxels_sync
-        manifest = _master_builder.process_voxels_sync(voxel_input.voxels)
-        
-        # Step 2: Save to Backboard
-        saved = _backboard_memory.save_build(
-            project_name=voxel_input.project_name,
-            room_type=voxel_input.room_type,
-            voxels=voxel_input.voxels,
-            manifest=manifest
-        )
-        
-        # Step 3: Get recommendations
-        similar_builds = _backboard_memory.get_similar_builds(
-            project_name=voxel_input.project_name,
-            room_type=voxel_input.room_type,
-            max_results=3
-        )
-        
-        recommendations = []
-        for build in similar_builds:
-            recommendations.append({
-                "project_name": build.get("project_name"),
-                "similarity": build.get("similarity", 0.8),
-                "brick_count": len(build.get("manifest", {}).get("bricks", []))
-            })
-        
-        return PipelineResponse(
-            status="success",
-            voxels=voxel_input.voxels,
-            manifest=manifest,
-            backboard_saved=saved,
-            recommendations=recommendations
+        _require_dicts(voxel_input.voxels, "voxels")
+        return await _run_pipeline(
+            backboard_memory, voxel_input.voxels, voxel_input.project_name, voxel_input.room_type,
+            build_pool
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -175,23 +251,38 @@ async def voxels_to_backboard(voxel_input: VoxelGridInput) -> PipelineResponse:
 # SAMPLE DATA ENDPOINT
 # ============================================================================
 
-@router.get("/sample-dorm-room/voxels")
-async def get_dorm_room_voxels() -> Dict:
+@lru_cache(maxsize=1)
+def _sample_voxels() -> List[Dict]:
+    """Sample dorm room voxels; the scene is fixed, so it is voxelized once (treat as read-only)"""
+    return get_sample_dorm_room_voxels()
+
+
+async def warm_sample_cache():
+    """Voxelize the sample room and prime MasterBuilder's build cache with its manifest"""
+    voxels = await asyncio.to_thread(_sample_voxels)
+    await asyncio.to_thread(_build_manifest, voxels)
+
+
+@router.get("/sample-dorm-room/voxels", response_model=None)
+async def get_dorm_room_voxels() -> ORJSONResponse:
     """
     Get voxel data for sample dorm room (no processing).
     
     Returns raw voxel grid extracted from the sample Three.js scene.
     """
-    voxels = get_sample_dorm_room_voxels()
-    return {
+    voxels = await asyncio.to_thread(_sample_voxels)
+    # Encoded directly; a Dict response model would re-walk every voxel first
+    return ORJSONResponse({
         "status": "success",
         "voxel_count": len(voxels),
         "voxels": voxels
-    }
+    })
 
 
-@router.post("/sample-dorm-room/process")
-async def process_dorm_room_to_backboard() -> PipelineResponse:
+@router.post("/sample-dorm-room/process", response_model=None, responses={200: {"model": PipelineResponse}})
+async def process_dorm_room_to_backboard(
+    backboard_memory: BackboardLegoMemory = Depends(get_backboard_memory)
+) -> StreamingResponse:
     """
     Process the sample dorm room through the complete pipeline.
     
@@ -202,45 +293,11 @@ async def process_dorm_room_to_backboard() -> PipelineResponse:
     4. Returns recommendations for similar builds
     """
     try:
-        if not _master_builder or not _backboard_memory:
-            raise HTTPException(status_code=503, detail="Services not initialized")
-        
-        # Get voxels from sample dorm room
-        voxels = get_sample_dorm_room_voxels()
-        
-        # Generate manifest using process_voxels_sync
-        manifest = _master_builder.process_voxels_sync(voxels)
-        
-        # Save to Backboard
-        saved = _backboard_memory.save_build(
-            project_name="sample-dorm-room",
-            room_type="bedroom",
-            voxels=voxels,
-            manifest=manifest
-        )
-        
-        # Get recommendations
-        similar_builds = _backboard_memory.get_similar_builds(
-            project_name="sample-dorm-room",
-            room_type="bedroom",
-            max_results=3
-        )
+        # Get voxels from sample dorm room (cached; the manifest then comes from this
+        # process's warmed build cache, so it skips the build pool)
+        voxels = await asyncio.to_thread(_sample_voxels)
         
-        recommendations = []
-        for build in similar_builds:
-            recommendations.append({
-                "project_name": build.get("project_name"),
-                "similarity": build.get("similarity", 0.8),
-                "brick_count": len(build.get("manifest", {}).get("bricks", []))
-            })
-        
-        return PipelineResponse(
-            status="success",
-            voxels=voxels,
-            manifest=manifest,
-            backboard_saved=saved,
-            recommendations=recommendations
-        )
+        return await _run_pipeline(backboard_memory, voxels, "sample-dorm-room", "bedroom")
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -250,9 +307,14 @@ async def process_dorm_room_to_backboard() -> PipelineResponse:
 # INITIALIZATION
 # ============================================================================
 
-def init_threejs_services(backboard_memory: BackboardLegoMemory, 
-                         master_builder: MasterBuilder):
-    """Initialize services for Three.js pipeline"""
-    global _backboard_memory, _master_builder
-    _backboard_memory = backboard_memory
-    _master_builder = master_builder
+def init_threejs_services(app: FastAPI, backboard_memory: BackboardLegoMemory,
+                          build_pool: Optional[Executor] = None):
+    """
+    Initialize services for Three.js pipeline.
+    
+    Stored on app.state and injected with Depends(get_backboard_memory) /
+    Depends(get_build_pool); the greedy build needs no shared instance (each
+    request gets its own MasterBuilder). Without a build_pool builds run in threads.
+    """
+    app.state.backboard_memory = backboard_memory
+    app.state.build_pool = build_pool
@@ -1,19 +1,130 @@
-from fastapi import FastAPI
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from app.api import endpoints
 from app.api.lego_build_endpoint import router as lego_build_router, init_lego_services
-from app.api.threejs_pipeline import router as threejs_router, init_threejs_services
+from app.api.threejs_pipeline import (
+    router as threejs_router,
+    init_build_worker,
+    init_threejs_services,
+    warm_sample_cache,
+)
 from app.api.solana_bb_coin import router as solana_bb_router
-from app.services.backboard_lego_memory import BackboardLegoMemory
-from app.services.master_builder import MasterBuilder
+
+# Initialize LEGO services on startup
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize services on app startup"""
+    # Greedy builds are CPU-bound; run pipeline builds in worker processes so
+    # concurrent requests use more than one core. Spawned (not forked) workers,
+    # since the server already has threads running.
+    build_pool = ProcessPoolExecutor(
+        max_workers=max(1, (os.cpu_count() or 1) - 1),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_build_worker
+    )
+    try:
+        backboard_memory = init_lego_services()
+        
+        # Initialize Three.js pipeline services (sharing the same Backboard memory)
+        init_threejs_services(app, backboard_memory, build_pool)
+        
+        # Sample dorm room voxels + manifest never change; build them before the first request
+        await warm_sample_cache()
+        
+        # Build (and cache) the OpenAPI schema now instead of on the first /docs hit
+        app.openapi()
+        
+        print("✅ LEGO Build Generation Services initialized")
+        print("✅ Backboard Memory initialized")
+        print("✅ Three.js Pipeline services initialized")
+        print("✅ Ready for Three.js voxel processing")
+    except Exception as e:
+        print(f"⚠️ Warning during service initialization: {e}")
+    yield
+    build_pool.shutdown(cancel_futures=True)
 
 app = FastAPI(
     title="Reality-to-Brick Pipeline",
     description="Transform 360° video into LEGO sets using Twelve Labs and Blackboard AI.",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
-# Add CORS middleware
+# Reject oversized request bodies before FastAPI parses/validates them. FastAPI reads
+# any non-form body as JSON (whatever its content-type, or none), so everything except
+# multipart video uploads - which stream to disk - is capped here
+MAX_JSON_BODY_BYTES = int(os.getenv("MAX_JSON_BODY_BYTES", 50 * 1024 * 1024))
+
+class JSONBodyLimitMiddleware:
+    """
+    413 for non-multipart requests whose body exceeds MAX_JSON_BODY_BYTES.
+    
+    A declared Content-Length is checked up front; otherwise (e.g. chunked
+    transfer encoding) the body is read here, counting the bytes actually
+    received, and handed to the app only if it stays under the limit.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request = Request(scope)
+        if request.headers.get("content-type", "").lower().startswith("multipart/"):
+            return await self.app(scope, receive, send)
+        
+        content_length = request.headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > MAX_JSON_BODY_BYTES:
+            return await self._reject(scope, receive, send)
+        
+        chunks = []
+        received = 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                # Client went away; let the app see the disconnect
+                return await self.app(scope, self._replay(b"".join(chunks), message, receive), send)
+            chunk = message.get("body", b"")
+            received += len(chunk)
+            if received > MAX_JSON_BODY_BYTES:
+                return await self._reject(scope, receive, send)
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        
+        return await self.app(scope, self._replay(b"".join(chunks), None, receive), send)
+    
+    @staticmethod
+    def _replay(body: bytes, pending, receive):
+        """receive() that yields the buffered body once, then defers to the server"""
+        messages = [pending] if pending is not None else [{"type": "http.request", "body": body, "more_body": False}]
+        
+        async def replay_receive():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+        
+        return replay_receive
+    
+    @staticmethod
+    async def _reject(scope, receive, send):
+        response = ORJSONResponse(
+            {"detail": f"Request body too large (max {MAX_JSON_BODY_BYTES} bytes)"},
+            status_code=413
+        )
+        await response(scope, receive, send)
+
+app.add_middleware(JSONBodyLimitMiddleware)
+
+# Add CORS middleware (registered last so it also wraps the size guard's 413)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],  # Frontend URL
@@ -28,25 +139,6 @@ app.include_router(lego_build_router)
 app.include_router(threejs_router)
 app.include_router(solana_bb_router)
 
-# Initialize LEGO services on startup
-@app.on_event("startup")
-async def startup_event():
-    """Initialize services on app startup"""
-    try:
-        init_lego_services()
-        
-        # Initialize Three.js pipeline services
-        backboard_memory = BackboardLegoMemory()
-        master_builder = MasterBuilder()
-        init_threejs_services(backboard_memory, master_builder)
-        
-        print("✅ LEGO Build Generation Services initialized")
-        print("✅ Backboard Memory initialized")
-        print("✅ Three.js Pipeline services initialized")
-        print("✅ Ready for Three.js voxel processing")
-    except Exception as e:
-        print(f"⚠️ Warning during service initialization: {e}")
-
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Reality-to-Brick Pipeline. Send a video to /process-video to begin."}
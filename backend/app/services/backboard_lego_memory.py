@@ -5,22 +5,127 @@ Stores build histories, component designs, and user preferences.
 """
 
 import logging
-import json
+import heapq
+import os
+import sys
+import threading
+from collections import defaultdict
 from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from datetime import datetime
-import uuid
+
+import numpy as np
+import orjson
+
+from app.services.threejs_voxelizer import VoxelSet
 
 logger = logging.getLogger(__name__)
 
+try:
+    from rapidfuzz import fuzz, process
+    from rapidfuzz.utils import default_process
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# zstd level for ".zst" exports (fast; the encode itself dominates export time)
+ZSTD_LEVEL = 3
+
+
+def _is_zstd_path(filepath: str) -> bool:
+    """Exports/imports are zstd-compressed when the path ends in .zst"""
+    if not filepath.endswith(".zst"):
+        return False
+    if not ZSTD_AVAILABLE:
+        raise ImportError("zstandard is not installed")
+    return True
+
+# Minimum rapidfuzz WRatio (0-100) for a build to count as similar
+FUZZY_SCORE_CUTOFF = 60
+
+
+# Voxel dicts with exactly these keys (int coordinates) are stored packed as a VoxelSet
+_VOXEL_KEYS = frozenset(("x", "y", "z", "hex_color"))
+
+
+def _intern(value: Any) -> Any:
+    """sys.intern strings (room/component types, names repeat across many builds)"""
+    return sys.intern(value) if isinstance(value, str) else value
+
 
-@dataclass
+def _pack_voxel_data(voxel_data: Dict) -> Dict:
+    """Store voxel_data["voxels"] as int16/uint32 columns under "_packed" (same key position)"""
+    voxels = voxel_data.get("voxels")
+    if not isinstance(voxels, list) or not all(
+        isinstance(voxel, dict) and voxel.keys() == _VOXEL_KEYS
+        and all(type(voxel[axis]) is int and -32768 <= voxel[axis] <= 32767 for axis in "xyz")
+        for voxel in voxels
+    ):
+        return voxel_data
+    return {
+        ("_packed" if key == "voxels" else key): (VoxelSet.from_dicts(voxels) if key == "voxels" else value)
+        for key, value in voxel_data.items()
+    }
+
+
+def _unpack_voxel_data(voxel_data: Dict) -> Dict:
+    """Inverse of _pack_voxel_data: materialize the voxel dicts again"""
+    packed = voxel_data.get("_packed")
+    if not isinstance(packed, VoxelSet):
+        return voxel_data
+    return {
+        ("voxels" if key == "_packed" else key): (packed.to_dicts() if key == "_packed" else value)
+        for key, value in voxel_data.items()
+    }
+
+
+def _load_packed_voxels(voxel_data: Dict) -> Dict:
+    """Rebuild the VoxelSet from an exported "_packed" mapping of column lists"""
+    packed = voxel_data.get("_packed")
+    if not isinstance(packed, dict):
+        return voxel_data
+    voxel_data["_packed"] = VoxelSet(
+        xs=np.asarray(packed["xs"], dtype=np.int16),
+        ys=np.asarray(packed["ys"], dtype=np.int16),
+        zs=np.asarray(packed["zs"], dtype=np.int16),
+        colors=np.asarray(packed["colors"], dtype=np.uint32),
+        palette=list(packed["palette"]),
+    )
+    return voxel_data
+
+
+def _msgpack_default(obj: Any) -> Any:
+    """msgpack hook: build entries are written field by field (like orjson does, without
+    unpacking voxels) and packed voxels as plain column lists"""
+    if isinstance(obj, BuildMemoryEntry):
+        return {name: getattr(obj, name) for name in _BUILD_ENTRY_FIELDS}
+    if isinstance(obj, VoxelSet):
+        return {
+            "xs": obj.xs.tolist(), "ys": obj.ys.tolist(), "zs": obj.zs.tolist(),
+            "colors": obj.colors.tolist(), "palette": obj.palette
+        }
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
+@dataclass(slots=True)
 class BuildMemoryEntry:
     """Single build memory entry"""
     build_id: str
     project_name: str
     user_id: str
-    voxel_data: Dict  # Original Three.js voxel input
+    voxel_data: Dict  # Original Three.js voxel input ("voxels" kept packed as "_packed")
     manifest: Dict    # Generated LEGO manifest
     piece_summary: Dict  # Piece count summary
     components: List[Dict]  # Saved components
@@ -29,12 +134,12 @@ class BuildMemoryEntry:
     metadata: Dict  # Custom metadata
     
     def to_dict(self) -> Dict:
-        """Convert to dictionary"""
+        """Convert to dictionary (voxel dicts are rebuilt from the packed columns here)"""
         return {
             "build_id": self.build_id,
             "project_name": self.project_name,
             "user_id": self.user_id,
-            "voxel_data": self.voxel_data,
+            "voxel_data": _unpack_voxel_data(self.voxel_data),
             "manifest": self.manifest,
             "piece_summary": self.piece_summary,
             "components": self.components,
@@ -44,6 +149,10 @@ class BuildMemoryEntry:
         }
 
 
+# BuildMemoryEntry field names, in to_dict key order (used by _msgpack_default)
+_BUILD_ENTRY_FIELDS = tuple(field.name for field in fields(BuildMemoryEntry))
+
+
 class BackboardLegoMemory:
     """
     Backboard-style stateful memory for LEGO builds.
@@ -66,6 +175,21 @@ class BackboardLegoMemory:
             "reuse_similar_components": True,
             "max_unique_parts": None
         }
+        # get_similar_builds results keyed by (project_name, room_type, max_results);
+        # cleared whenever the set of builds changes
+        self._similar_cache: Dict[Tuple[str, Optional[str], int], List[Dict]] = {}
+        # room_type -> builds in insertion order, so room-filtered similarity
+        # queries only scan that room instead of every stored build
+        self._builds_by_room: Dict[str, List[BuildMemoryEntry]] = defaultdict(list)
+        # build_id -> lowercased project_name for the substring fallback, and
+        # room_type -> (builds, default_process'd names) for rapidfuzz; both are
+        # computed once per build/index change instead of on every query
+        self._names_lower: Dict[str, str] = {}
+        self._fuzzy_choices: Dict[Optional[str], Tuple[List[BuildMemoryEntry], List[str]]] = {}
+        # component_type -> component ids in library order (kept in step with component_library)
+        self._components_by_type: Dict[Optional[str], List[str]] = defaultdict(list)
+        # Endpoints call into memory from worker threads; guards builds + cache
+        self._lock = threading.RLock()
     
     def save_build(
         self,
@@ -93,13 +217,16 @@ class BackboardLegoMemory:
             Build ID
         """
         try:
-            build_id = str(uuid.uuid4())
+            # 128 random bits as hex (same entropy as uuid4, no UUID object/formatting)
+            build_id = os.urandom(16).hex()
+            project_name = _intern(project_name)
+            room_type = _intern(room_type)
             
             entry = BuildMemoryEntry(
                 build_id=build_id,
                 project_name=project_name,
                 user_id=self.user_id,
-                voxel_data=voxel_data,
+                voxel_data=_pack_voxel_data(voxel_data),
                 manifest=manifest,
                 piece_summary=piece_summary,
                 components=components,
@@ -108,7 +235,12 @@ class BackboardLegoMemory:
                 metadata=metadata or {}
             )
             
-            self.builds[build_id] = entry
+            with self._lock:
+                self.builds[build_id] = entry
+                self._builds_by_room[room_type].append(entry)
+                self._names_lower[build_id] = project_name.lower()
+                self._similar_cache.clear()
+                self._fuzzy_choices.clear()
             
             logger.info(f"Saved build {build_id} to Backboard memory: {project_name}")
             return build_id
@@ -123,19 +255,14 @@ class BackboardLegoMemory:
     
     def get_builds_by_room(self, room_type: str) -> List[BuildMemoryEntry]:
         """Get all builds for a specific room type"""
-        return [
-            build for build in self.builds.values()
-            if build.room_type == room_type
-        ]
+        with self._lock:
+            return list(self._builds_by_room.get(room_type, ()))
     
     def get_recent_builds(self, limit: int = 10) -> List[BuildMemoryEntry]:
         """Get recent builds"""
-        builds = sorted(
-            self.builds.values(),
-            key=lambda b: b.creation_date,
-            reverse=True
-        )
-        return builds[:limit]
+        # Top-k by date without sorting every build (same order as sorted(..., reverse=True))
+        with self._lock:
+            return heapq.nlargest(limit, self.builds.values(), key=lambda b: b.creation_date)
     
     def add_to_component_library(
         self,
@@ -159,6 +286,14 @@ class BackboardLegoMemory:
             True if successful
         """
         try:
+            component_type = _intern(component_type)
+            previous = self.component_library.get(component_id)
+            if previous is None:
+                self._components_by_type[component_type].append(component_id)
+            elif previous.get("component_type") != component_type:
+                self._components_by_type[previous.get("component_type")].remove(component_id)
+                self._components_by_type[component_type].append(component_id)
+            
             self.component_library[component_id] = {
                 "component_type": component_type,
                 "brick_composition": brick_composition,
@@ -182,8 +317,8 @@ class BackboardLegoMemory:
     def get_library_by_type(self, component_type: str) -> Dict[str, Dict]:
         """Get all components of a type from library"""
         return {
-            cid: comp for cid, comp in self.component_library.items()
-            if comp.get("component_type") == component_type
+            cid: self.component_library[cid]
+            for cid in self._components_by_type.get(component_type, ())
         }
     
     def update_preferences(self, preferences: Dict) -> bool:
@@ -199,18 +334,15 @@ class BackboardLegoMemory:
     
     def get_statistics(self) -> Dict:
         """Get memory statistics"""
-        builds_by_room = {}
-        for build in self.builds.values():
-            if build.room_type not in builds_by_room:
-                builds_by_room[build.room_type] = 0
-            builds_by_room[build.room_type] += 1
+        # Counts come straight from the secondary indexes (O(#types), not O(#builds))
+        with self._lock:
+            builds_by_room = {
+                room_type: len(builds) for room_type, builds in self._builds_by_room.items() if builds
+            }
         
-        components_by_type = {}
-        for comp in self.component_library.values():
-            comp_type = comp.get("component_type")
-            if comp_type not in components_by_type:
-                components_by_type[comp_type] = 0
-            components_by_type[comp_type] += 1
+        components_by_type = {
+            comp_type: len(ids) for comp_type, ids in self._components_by_type.items() if ids
+        }
         
         return {
             "user_id": self.user_id,
@@ -221,19 +353,52 @@ class BackboardLegoMemory:
             "user_preferences": self.user_preferences
         }
     
-    def export_memory(self, filepath: str) -> bool:
-        """Export all memory to JSON file"""
+    def export_memory(self, filepath: str, format: str = "json") -> bool:
+        """
+        Export all memory to file.
+        
+        Args:
+            filepath: Output path
+            format: "json" (default, indented) or "msgpack" (binary, roughly half
+                the size and faster to encode/decode; needs the msgpack package)
+        
+        A filepath ending in ".zst" is zstd-compressed (needs the zstandard package).
+        """
         try:
+            if format == "msgpack":
+                if not MSGPACK_AVAILABLE:
+                    raise ImportError("msgpack is not installed")
+            elif format != "json":
+                raise ValueError(f"Unknown export format: {format}")
+            
+            # orjson and _msgpack_default walk the dataclasses directly (same keys as
+            # to_dict, but packed voxels go out as column arrays instead of one object
+            # per voxel)
+            builds = list(self.builds.values())
+            
             data = {
                 "user_id": self.user_id,
-                "builds": [build.to_dict() for build in self.builds.values()],
+                "builds": builds,
                 "component_library": self.component_library,
                 "user_preferences": self.user_preferences,
                 "export_date": datetime.now().isoformat()
             }
             
-            with open(filepath, 'w') as f:
-                json.dump(data, f, indent=2)
+            if format == "msgpack":
+                payload = msgpack.packb(data, use_bin_type=True, default=_msgpack_default)
+            else:
+                # NON_STR_KEYS: manifests carry int keys (json.dump stringified them too)
+                payload = orjson.dumps(
+                    data,
+                    option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+                )
+            
+            with open(filepath, 'wb') as f:
+                if _is_zstd_path(filepath):
+                    with zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(f) as zf:
+                        zf.write(payload)
+                else:
+                    f.write(payload)
             
             logger.info(f"Exported Backboard memory to {filepath}")
             return True
@@ -242,33 +407,64 @@ class BackboardLegoMemory:
             logger.error(f"Error exporting memory: {e}")
             return False
     
-    def import_memory(self, filepath: str) -> bool:
-        """Import memory from JSON file"""
+    def import_memory(self, filepath: str, format: str = "json") -> bool:
+        """Import memory from a file written by export_memory (same format argument)"""
         try:
-            with open(filepath, 'r') as f:
-                data = json.load(f)
+            with open(filepath, 'rb') as f:
+                if _is_zstd_path(filepath):
+                    with zstandard.ZstdDecompressor().stream_reader(f) as zf:
+                        payload = zf.read()
+                else:
+                    payload = f.read()
+            
+            if format == "msgpack":
+                if not MSGPACK_AVAILABLE:
+                    raise ImportError("msgpack is not installed")
+                # strict_map_key=False: manifests carry int keys, which msgpack keeps as ints
+                data = msgpack.unpackb(payload, raw=False, strict_map_key=False)
+            elif format == "json":
+                data = orjson.loads(payload)
+            else:
+                raise ValueError(f"Unknown import format: {format}")
             
             self.user_id = data.get("user_id", self.user_id)
             
             # Import builds
-            self.builds.clear()
+            builds: Dict[str, BuildMemoryEntry] = {}
             for build_data in data.get("builds", []):
                 entry = BuildMemoryEntry(
                     build_id=build_data.get("build_id"),
-                    project_name=build_data.get("project_name"),
+                    project_name=_intern(build_data.get("project_name")),
                     user_id=build_data.get("user_id"),
-                    voxel_data=build_data.get("voxel_data", {}),
+                    voxel_data=_load_packed_voxels(build_data.get("voxel_data", {})),
                     manifest=build_data.get("manifest", {}),
-                    piece_summary=build_data.get("piece_summary", {}),
+                    piece_summary={
+                        _intern(key): value for key, value in build_data.get("piece_summary", {}).items()
+                    },
                     components=build_data.get("components", []),
                     creation_date=build_data.get("creation_date"),
-                    room_type=build_data.get("room_type", "generic"),
+                    room_type=_intern(build_data.get("room_type", "generic")),
                     metadata=build_data.get("metadata", {})
                 )
-                self.builds[entry.build_id] = entry
+                builds[entry.build_id] = entry
+            
+            with self._lock:
+                self.builds = builds
+                self._builds_by_room = defaultdict(list)
+                self._names_lower = {}
+                for entry in builds.values():
+                    self._builds_by_room[entry.room_type].append(entry)
+                    self._names_lower[entry.build_id] = entry.project_name.lower()
+                self._similar_cache.clear()
+                self._fuzzy_choices.clear()
             
             # Import components
             self.component_library = data.get("component_library", {})
+            self._components_by_type = defaultdict(list)
+            for cid, comp in self.component_library.items():
+                if "component_type" in comp:
+                    comp["component_type"] = _intern(comp["component_type"])
+                self._components_by_type[comp.get("component_type")].append(cid)
             
             # Import preferences
             self.user_preferences.update(data.get("user_preferences", {}))
@@ -297,33 +493,102 @@ class BackboardLegoMemory:
         Returns:
             List of similar builds
         """
-        results = []
+        return self.get_similar_builds_batch([(project_name, room_type)], max_results)[0]
+    
+    @staticmethod
+    def _similar_entry(build: BuildMemoryEntry, similarity: float) -> Dict:
+        """Recommendation-shaped summary of a build"""
+        return {
+            "build_id": build.build_id,
+            "project_name": build.project_name,
+            "room_type": build.room_type,
+            "creation_date": build.creation_date,
+            "total_bricks": build.piece_summary.get("total_pieces", 0),
+            "brick_count": build.manifest.get("total_bricks", 0),
+            "similarity": similarity
+        }
+    
+    def get_similar_builds_batch(
+        self,
+        queries: List[Tuple[str, Optional[str]]],
+        max_results: int = 5
+    ) -> List[List[Dict]]:
+        """
+        Find similar builds for several (project_name, room_type) queries at once.
+        
+        Cached queries are answered directly; all misses are resolved together in
+        a single pass over stored builds. With rapidfuzz installed, names are
+        ranked by WRatio score (C implementation, top-k in one call); otherwise
+        any case-insensitive containment scores 0.8.
         
-        for build in self.builds.values():
-            # Filter by room type if provided
-            if room_type and build.room_type != room_type:
-                continue
+        Args:
+            queries: (project_name, room_type) pairs; room_type may be None
+            max_results: Max results per query
             
-            # Simple name similarity (could use fuzzy matching)
-            name_lower = project_name.lower()
-            build_name_lower = build.project_name.lower()
+        Returns:
+            One list of similar builds per query, in query order
+        """
+        with self._lock:
+            misses = [
+                query for query in dict.fromkeys(queries)
+                if (query[0], query[1], max_results) not in self._similar_cache
+            ]
             
-            similarity = 0.0
-            if name_lower in build_name_lower or build_name_lower in name_lower:
-                similarity = 0.8
+            if misses:
+                candidates: Dict[Tuple[str, Optional[str]], List[Dict]] = {query: [] for query in misses}
+                
+                # Group misses by room so each room's builds are scanned once
+                misses_by_room: Dict[Optional[str], List[Tuple[str, Optional[str]]]] = defaultdict(list)
+                for query in misses:
+                    misses_by_room[query[1] or None].append(query)
+                
+                for room_type, room_misses in misses_by_room.items():
+                    builds = self._builds_by_room.get(room_type, []) if room_type else self.builds.values()
+                    
+                    if RAPIDFUZZ_AVAILABLE:
+                        if room_type not in self._fuzzy_choices:
+                            builds = list(builds)
+                            self._fuzzy_choices[room_type] = (
+                                builds, [default_process(build.project_name) for build in builds]
+                            )
+                        builds, choices = self._fuzzy_choices[room_type]
+                        for project_name, query_room_type in room_misses:
+                            matches = process.extract(
+                                default_process(project_name), choices,
+                                scorer=fuzz.WRatio, processor=None,
+                                limit=max_results, score_cutoff=FUZZY_SCORE_CUTOFF
+                            )
+                            candidates[(project_name, query_room_type)] = [
+                                self._similar_entry(builds[index], score / 100)
+                                for _, score, index in matches
+                            ]
+                        continue
+                    
+                    # Simple name similarity (fallback when rapidfuzz is not installed)
+                    lowered_misses = [(query, query[0].lower()) for query in room_misses]
+                    for build in builds:
+                        build_name_lower = self._names_lower[build.build_id]
+                        
+                        for query, name_lower in lowered_misses:
+                            similarity = 0.0
+                            if name_lower in build_name_lower or build_name_lower in name_lower:
+                                similarity = 0.8
+                            
+                            if similarity > 0:
+                                candidates[query].append(
+                                    self._similar_entry(build, similarity)
+                                )
+                
+                # Top-k without sorting every candidate
+                for (project_name, room_type), results in candidates.items():
+                    self._similar_cache[(project_name, room_type, max_results)] = heapq.nlargest(
+                        max_results, results, key=lambda x: x["similarity"]
+                    )
             
-            if similarity > 0:
-                results.append({
-                    "build_id": build.build_id,
-                    "project_name": build.project_name,
-                    "room_type": build.room_type,
-                    "creation_date": build.creation_date,
-                    "total_bricks": build.piece_summary.get("total_pieces", 0),
-                    "similarity": similarity
-                })
-        
-        results.sort(key=lambda x: x["similarity"], reverse=True)
-        return results[:max_results]
+            return [
+                list(self._similar_cache[(project_name, room_type, max_results)])
+                for project_name, room_type in queries
+            ]
 
 
 class LegoBuildOrchestrator:
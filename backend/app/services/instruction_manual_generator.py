@@ -4,21 +4,171 @@ Creates step-by-step building instructions from LEGO manifests.
 Organizes bricks by layer and provides guided assembly workflow.
 """
 
+import html
 import logging
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterator, List, Tuple, Optional
 from dataclasses import dataclass
-from collections import defaultdict
+from functools import lru_cache
+from itertools import chain
+
+import numpy as np
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# Rules and borders of the text export, built once instead of on every call
+_STEP_RULE = "=" * 60
+_SECTION_RULE = "═" * 60
+_OVERVIEW_RULE = "─" * 60
+_BOX_EDGE = "═" * 58
+_TEXT_HEADER_LINES = (
+    "╔" + _BOX_EDGE + "╗",
+    "║" + " " * 15 + "LEGO BUILD INSTRUCTION MANUAL" + " " * 14 + "║",
+    "╚" + _BOX_EDGE + "╝",
+)
+_TEXT_FOOTER_LINES = (
+    "\n" + "╔" + _BOX_EDGE + "╗",
+    "║" + " " * 20 + "BUILD COMPLETE! ✓" + " " * 20 + "║",
+    "╚" + _BOX_EDGE + "╝\n",
+)
+
+# Static parts of the HTML export. Per-brick lines stay f-strings (faster than
+# str.format with index lookups) and each step is joined in one go.
+_HTML_STYLE = """  <style>
+    body { font-family: Arial, sans-serif; margin: 20px; background: #f5f5f5; }
+    .header { background: #e74c3c; color: white; padding: 20px; border-radius: 5px; text-align: center; }
+    .info { background: white; padding: 15px; margin: 20px 0; border-radius: 5px; border-left: 5px solid #3498db; }
+    .step { background: white; padding: 20px; margin: 20px 0; border-radius: 5px; box-shadow: 0 2px 5px rgba(0,0,0,0.1); }
+    .step-title { color: #e74c3c; font-size: 18px; font-weight: bold; margin-bottom: 10px; }
+    .parts-list { background: #ecf0f1; padding: 10px; border-radius: 3px; margin: 10px 0; }
+    .brick-item { font-family: monospace; margin: 5px 0; }
+    .complete { color: #27ae60; font-weight: bold; text-align: center; padding: 20px; font-size: 24px; }
+  </style>
+</head>
+<body>
+"""
+_HTML_PLACEMENT_OPEN = """    </div>
+    <p><strong>Placement instructions:</strong></p>
+    <ol>
+"""
+_HTML_STEP_CLOSE = """    </ol>
+  </div>
+"""
+_HTML_FOOTER = """  <div class='complete'>✓ BUILD COMPLETE!</div>
+</body>
+</html>"""
+
+# Shared default for bricks without a position (a tuple, so nothing is allocated per brick)
+_ZERO_POS = (0, 0, 0)
+
+
+def _stud_position(brick: Dict):
+    """
+    A brick's [x, y, z] in studs. MasterBuilder manifests nest it as
+    {"studs": [...], "mm": [...]}; flat [x, y, z] lists are accepted as-is.
+    """
+    position = brick.get("position", _ZERO_POS)
+    if isinstance(position, dict):
+        return position.get("studs", _ZERO_POS)
+    return position
+
+
+@lru_cache(maxsize=4096)
+def _html_escape(value) -> str:
+    """HTML-escaped str(value); part ids repeat across bricks, so each is escaped once"""
+    return html.escape(str(value))
+
+
+# Each entry holds a whole layer's text and brick tuples, so keep the cache modest
+@lru_cache(maxsize=1024)
+def _render_step_instructions(
+    step_number: int,
+    layer_z: int,
+    layer_num: int,
+    piece_counts: Tuple[Tuple[str, int], ...],
+    bricks: Tuple[Tuple[str, Tuple[int, ...], int], ...]
+) -> str:
+    """Step text for sorted (part_id, qty) pairs and (part_id, position, rotation) bricks"""
+    # Parts needed
+    parts = "\n".join(f"  • {part_id}: {qty} piece(s)" for part_id, qty in piece_counts)
+    
+    # Placement instructions (bricks arrive sorted by position, see generate_build_guide)
+    placements = "\n".join(
+        f"  {idx}. Brick {part_id} at position ({pos[0]}, {pos[1]}, {pos[2]}), rotation {rotation}°"
+        for idx, (part_id, pos, rotation) in enumerate(bricks, 1)
+    )
+    
+    # One formatting pass for the whole step
+    return (
+        f"\n{_STEP_RULE}\nSTEP {step_number}: BUILD LAYER {layer_num} (Height: {layer_z})\n{_STEP_RULE}\n"
+        f"\nParts needed for this step:\n{parts}\n"
+        f"\nPlace {len(bricks)} bricks as follows:\n{placements}\n"
+        f"\n✓ Total bricks in this step: {len(bricks)}\n{_STEP_RULE}"
+    )
+
+
+@dataclass
+class BrickArray:
+    """
+    Brick fields as parallel columns (SoA), read out of the manifest dicts once.
+    
+    Positions are an (n, 3) int array of stud coordinates; part ids and rotations
+    stay Python lists since they are only formatted. Part ids are also coded as
+    small ints (part_codes indexes part_catalog) so they can be counted with
+    np.bincount instead of hashing strings. The catalog is sorted, so counts come
+    out already in part id order for the exporters.
+    """
+    positions: np.ndarray
+    part_ids: List[str]
+    rotations: List[int]
+    part_codes: np.ndarray
+    part_catalog: List[str]
+    
+    def __len__(self) -> int:
+        return len(self.part_ids)
+    
+    @classmethod
+    def from_bricks(cls, bricks: List[Dict]) -> "BrickArray":
+        """Single pass over manifest brick dicts (the only place defaults are filled in)"""
+        part_ids = [brick.get("part_id") for brick in bricks]
+        catalog = sorted(set(part_ids), key=str)
+        codes = {part_id: code for code, part_id in enumerate(catalog)}
+        return cls(
+            positions=np.fromiter(
+                chain.from_iterable(_stud_position(brick)[:3] for brick in bricks),
+                dtype=np.int64, count=3 * len(bricks)
+            ).reshape(len(bricks), 3),
+            part_ids=part_ids,
+            rotations=[brick.get("rotation", 0) for brick in bricks],
+            part_codes=np.fromiter(
+                map(codes.__getitem__, part_ids), dtype=np.int32, count=len(part_ids)
+            ),
+            part_catalog=catalog,
+        )
+    
+    def take(self, indices: List[int]) -> "BrickArray":
+        """Columns reordered/subset by indices"""
+        return BrickArray(
+            positions=self.positions[indices],
+            part_ids=[self.part_ids[i] for i in indices],
+            rotations=[self.rotations[i] for i in indices],
+            part_codes=self.part_codes[indices],
+            part_catalog=self.part_catalog,
+        )
+    
+    def piece_counts(self, start: int, end: int) -> Dict[str, int]:
+        """Part ID -> quantity for rows start:end, in sorted part id order"""
+        counts = np.bincount(self.part_codes[start:end], minlength=len(self.part_catalog))
+        return {self.part_catalog[code]: count for code, count in enumerate(counts.tolist()) if count}
+
 
 @dataclass
 class BuildStep:
     """Represents a single step in the build process"""
     step_number: int
     layer_z: int
-    bricks_in_step: List[Dict]  # Bricks to place in this step
-    piece_counts: Dict[str, int]  # Part ID -> quantity for this step
+    bricks_in_step: List[Dict]  # Bricks to place in this step, ordered by (x, y)
+    piece_counts: Dict[str, int]  # Part ID -> quantity for this step, sorted by part ID
     instructions: str  # Human-readable instructions
 
 
@@ -42,6 +192,9 @@ class InstructionManualGenerator:
     # Time estimation: average seconds per brick placement
     TIME_PER_BRICK = 3  # seconds
     
+    # Difficulty by total bricks: < 50 Easy, < 150 Medium, otherwise Hard
+    DIFFICULTY_LABELS = ("Easy", "Medium", "Hard")
+    
     @staticmethod
     def generate_build_guide(manifest: Dict, project_name: str = "LEGO Build") -> BuildGuide:
         """
@@ -55,67 +208,63 @@ class InstructionManualGenerator:
             BuildGuide with organized steps
         """
         try:
-            # Group bricks by layer
-            bricks_by_layer = defaultdict(list)
-            total_bricks = 0
-            
-            for brick in manifest.get("bricks", []):
-                z = brick.get("position", [0, 0, 0])[2]
-                bricks_by_layer[z].append(brick)
-                total_bricks += 1
-            
-            # Sort layers
-            sorted_layers = sorted(bricks_by_layer.keys())
+            # Group bricks by layer: one pass reads the brick dicts into columns,
+            # then a single lexsort orders bricks by (z, x, y) (stable, so ties keep
+            # manifest order). Each layer is then a contiguous slice that is already
+            # in placement order, so neither the steps nor the exporters re-sort.
+            bricks = manifest.get("bricks", [])
+            total_bricks = len(bricks)
+            columns = BrickArray.from_bricks(bricks)
+            positions = columns.positions
+            order = np.lexsort((positions[:, 1], positions[:, 0], positions[:, 2])).tolist()
+            columns = columns.take(order)
+            zs = columns.positions[:, 2]
+            starts = np.flatnonzero(np.diff(zs)) + 1
+            sorted_layers = zs[np.insert(starts, 0, 0)] if total_bricks else zs
+            bounds = [0, *starts.tolist(), total_bricks]
+            # Steps are rendered from the sorted columns; dicts are only gathered
+            # for BuildStep.bricks_in_step
+            placements = list(zip(columns.part_ids, map(tuple, columns.positions.tolist()), columns.rotations))
             
             # Generate steps (one per layer, or group small layers)
             steps = []
             step_number = 1
+            layer_summary = {}
             
-            for layer_idx, z in enumerate(sorted_layers):
-                bricks_in_layer = bricks_by_layer[z]
+            for layer_idx, z in enumerate(sorted_layers.tolist()):
+                start, end = bounds[layer_idx], bounds[layer_idx + 1]
+                bricks_in_layer = [bricks[i] for i in order[start:end]]
+                layer_summary[z] = f"Layer {z}: {len(bricks_in_layer)} bricks placed"
                 
                 # Count pieces for this layer
-                piece_counts = defaultdict(int)
-                for brick in bricks_in_layer:
-                    part_id = brick.get("part_id")
-                    piece_counts[part_id] += 1
+                piece_counts = columns.piece_counts(start, end)
                 
                 # Generate step instructions
                 instructions = InstructionManualGenerator._generate_step_instructions(
                     step_number=step_number,
                     layer_z=z,
                     layer_num=layer_idx + 1,
-                    bricks=bricks_in_layer,
-                    piece_counts=dict(piece_counts)
+                    placements=tuple(placements[start:end]),
+                    piece_counts=piece_counts
                 )
                 
                 step = BuildStep(
                     step_number=step_number,
                     layer_z=z,
                     bricks_in_step=bricks_in_layer,
-                    piece_counts=dict(piece_counts),
+                    piece_counts=piece_counts,
                     instructions=instructions
                 )
                 
                 steps.append(step)
                 step_number += 1
             
-            # Estimate difficulty
-            if total_bricks < 50:
-                difficulty = "Easy"
-            elif total_bricks < 150:
-                difficulty = "Medium"
-            else:
-                difficulty = "Hard"
+            # Estimate difficulty (table lookup on the summed threshold bools)
+            difficulty = InstructionManualGenerator.DIFFICULTY_LABELS[(total_bricks >= 50) + (total_bricks >= 150)]
             
             # Estimate time (in minutes)
             estimated_time = max(5, (total_bricks * InstructionManualGenerator.TIME_PER_BRICK) // 60)
             
-            # Generate layer summary
-            layer_summary = {}
-            for z, bricks in bricks_by_layer.items():
-                layer_summary[z] = f"Layer {z}: {len(bricks)} bricks placed"
-            
             return BuildGuide(
                 project_name=project_name,
                 total_steps=len(steps),
@@ -143,7 +292,7 @@ class InstructionManualGenerator:
         step_number: int,
         layer_z: int,
         layer_num: int,
-        bricks: List[Dict],
+        placements: Tuple[Tuple[str, Tuple[int, int, int], int], ...],
         piece_counts: Dict[str, int]
     ) -> str:
         """
@@ -153,40 +302,17 @@ class InstructionManualGenerator:
             step_number: Step number
             layer_z: Z coordinate (height) of layer
             layer_num: Layer number (1-indexed)
-            bricks: List of bricks in this step
-            piece_counts: Count of each piece type
+            placements: (part_id, position, rotation) per brick, in placement order
+            piece_counts: Count of each piece type (already in part id order)
             
         Returns:
             Formatted instruction string
         """
-        lines = []
-        lines.append(f"\n{'='*60}")
-        lines.append(f"STEP {step_number}: BUILD LAYER {layer_num} (Height: {layer_z})")
-        lines.append(f"{'='*60}")
-        
-        # Parts needed
-        lines.append("\nParts needed for this step:")
-        for part_id, qty in sorted(piece_counts.items()):
-            lines.append(f"  • {part_id}: {qty} piece(s)")
-        
-        # Placement instructions
-        lines.append(f"\nPlace {len(bricks)} bricks as follows:")
-        
-        # Sort bricks by position for logical ordering
-        sorted_bricks = sorted(bricks, key=lambda b: (b.get("position", [0, 0, 0])[0], b.get("position", [0, 0, 0])[1]))
-        
-        for idx, brick in enumerate(sorted_bricks, 1):
-            pos = brick.get("position", [0, 0, 0])
-            part_id = brick.get("part_id")
-            rotation = brick.get("rotation", 0)
-            color_id = brick.get("color_id", 16)
-            
-            lines.append(f"  {idx}. Brick {part_id} at position ({pos[0]}, {pos[1]}, {pos[2]}), rotation {rotation}°")
-        
-        lines.append(f"\n✓ Total bricks in this step: {len(bricks)}")
-        lines.append(f"{'='*60}")
-        
-        return "\n".join(lines)
+        # Rendering is memoized on the step's content (regenerated guides and
+        # repeated layers reuse the text); placements are already hashable tuples
+        return _render_step_instructions(
+            step_number, layer_z, layer_num, tuple(piece_counts.items()), placements
+        )
     
     @staticmethod
     def export_to_text(guide: BuildGuide) -> str:
@@ -199,41 +325,28 @@ class InstructionManualGenerator:
         Returns:
             Formatted text string suitable for printing
         """
-        lines = []
-        
-        # Header
-        lines.append("╔" + "═" * 58 + "╗")
-        lines.append("║" + " " * 15 + "LEGO BUILD INSTRUCTION MANUAL" + " " * 14 + "║")
-        lines.append("╚" + "═" * 58 + "╝")
-        
-        # Project info
-        lines.append(f"\nProject: {guide.project_name}")
-        lines.append(f"Total Bricks: {guide.total_bricks}")
-        lines.append(f"Total Steps: {guide.total_steps}")
-        lines.append(f"Estimated Time: {guide.estimated_time_minutes} minutes")
-        lines.append(f"Difficulty Level: {guide.difficulty}")
-        
-        # Layer summary
-        lines.append("\n" + "─" * 60)
-        lines.append("LAYER OVERVIEW")
-        lines.append("─" * 60)
-        for z in sorted(guide.layer_summary.keys()):
-            lines.append(f"  {guide.layer_summary[z]}")
-        
-        # Steps
-        lines.append("\n" + "═" * 60)
-        lines.append("DETAILED BUILD STEPS")
-        lines.append("═" * 60)
-        
-        for step in guide.steps:
-            lines.append(step.instructions)
-        
-        # Completion message
-        lines.append("\n" + "╔" + "═" * 58 + "╗")
-        lines.append("║" + " " * 20 + "BUILD COMPLETE! ✓" + " " * 20 + "║")
-        lines.append("╚" + "═" * 58 + "╝\n")
-        
-        return "\n".join(lines)
+        return "\n".join(chain(
+            # Header
+            _TEXT_HEADER_LINES,
+            # Project info
+            (
+                f"\nProject: {guide.project_name}",
+                f"Total Bricks: {guide.total_bricks}",
+                f"Total Steps: {guide.total_steps}",
+                f"Estimated Time: {guide.estimated_time_minutes} minutes",
+                f"Difficulty Level: {guide.difficulty}",
+                # Layer summary
+                "\n" + _OVERVIEW_RULE,
+                "LAYER OVERVIEW",
+                _OVERVIEW_RULE,
+            ),
+            (f"  {guide.layer_summary[z]}" for z in sorted(guide.layer_summary.keys())),
+            # Steps
+            ("\n" + _SECTION_RULE, "DETAILED BUILD STEPS", _SECTION_RULE),
+            (step.instructions for step in guide.steps),
+            # Completion message
+            _TEXT_FOOTER_LINES,
+        ))
     
     @staticmethod
     def export_to_html(guide: BuildGuide) -> str:
@@ -246,75 +359,74 @@ class InstructionManualGenerator:
         Returns:
             HTML formatted string
         """
-        html = []
-        
-        html.append("<!DOCTYPE html>")
-        html.append("<html>")
-        html.append("<head>")
-        html.append("  <title>LEGO Build Instructions - " + guide.project_name + "</title>")
-        html.append("  <style>")
-        html.append("    body { font-family: Arial, sans-serif; margin: 20px; background: #f5f5f5; }")
-        html.append("    .header { background: #e74c3c; color: white; padding: 20px; border-radius: 5px; text-align: center; }")
-        html.append("    .info { background: white; padding: 15px; margin: 20px 0; border-radius: 5px; border-left: 5px solid #3498db; }")
-        html.append("    .step { background: white; padding: 20px; margin: 20px 0; border-radius: 5px; box-shadow: 0 2px 5px rgba(0,0,0,0.1); }")
-        html.append("    .step-title { color: #e74c3c; font-size: 18px; font-weight: bold; margin-bottom: 10px; }")
-        html.append("    .parts-list { background: #ecf0f1; padding: 10px; border-radius: 3px; margin: 10px 0; }")
-        html.append("    .brick-item { font-family: monospace; margin: 5px 0; }")
-        html.append("    .complete { color: #27ae60; font-weight: bold; text-align: center; padding: 20px; font-size: 24px; }")
-        html.append("  </style>")
-        html.append("</head>")
-        html.append("<body>")
-        
-        # Header
-        html.append(f"  <div class='header'>")
-        html.append(f"    <h1>LEGO BUILD INSTRUCTIONS</h1>")
-        html.append(f"    <p>{guide.project_name}</p>")
-        html.append(f"  </div>")
+        return "".join(InstructionManualGenerator.iter_html(guide))
+    
+    @staticmethod
+    def iter_html(guide: BuildGuide) -> Iterator[str]:
+        """
+        Yield the export_to_html document piecewise: the head, one chunk per step,
+        then the footer. Lets callers stream large guides (e.g. StreamingResponse)
+        instead of holding the whole document in memory.
         
-        # Project info
-        html.append(f"  <div class='info'>")
-        html.append(f"    <h2>Project Details</h2>")
-        html.append(f"    <p><strong>Total Bricks:</strong> {guide.total_bricks}</p>")
-        html.append(f"    <p><strong>Total Steps:</strong> {guide.total_steps}</p>")
-        html.append(f"    <p><strong>Estimated Time:</strong> {guide.estimated_time_minutes} minutes</p>")
-        html.append(f"    <p><strong>Difficulty:</strong> {guide.difficulty}</p>")
-        html.append(f"  </div>")
+        Args:
+            guide: BuildGuide object
+            
+        Yields:
+            HTML fragments that concatenate to export_to_html(guide)
+        """
+        # Names and part ids come from user input, so they are escaped
+        project_name = _html_escape(guide.project_name)
+        yield (
+            "<!DOCTYPE html>\n<html>\n<head>\n"
+            f"  <title>LEGO Build Instructions - {project_name}</title>\n"
+            + _HTML_STYLE
+            # Header and project info
+            + "  <div class='header'>\n"
+            "    <h1>LEGO BUILD INSTRUCTIONS</h1>\n"
+            f"    <p>{project_name}</p>\n"
+            "  </div>\n"
+            "  <div class='info'>\n"
+            "    <h2>Project Details</h2>\n"
+            f"    <p><strong>Total Bricks:</strong> {guide.total_bricks}</p>\n"
+            f"    <p><strong>Total Steps:</strong> {guide.total_steps}</p>\n"
+            f"    <p><strong>Estimated Time:</strong> {guide.estimated_time_minutes} minutes</p>\n"
+            f"    <p><strong>Difficulty:</strong> {guide.difficulty}</p>\n"
+            "  </div>\n"
+        )
         
         # Steps
         for step in guide.steps:
-            html.append(f"  <div class='step'>")
-            html.append(f"    <div class='step-title'>Step {step.step_number}: Layer {step.layer_z}</div>")
-            html.append(f"    <div class='parts-list'>")
-            html.append(f"      <strong>Parts needed:</strong><br>")
-            for part_id, qty in sorted(step.piece_counts.items()):
-                html.append(f"      <div class='brick-item'>• {part_id}: {qty} piece(s)</div>")
-            html.append(f"    </div>")
-            html.append(f"    <p><strong>Placement instructions:</strong></p>")
-            html.append(f"    <ol>")
-            sorted_bricks = sorted(step.bricks_in_step, key=lambda b: (b.get("position", [0, 0, 0])[0], b.get("position", [0, 0, 0])[1]))
-            for brick in sorted_bricks:
-                pos = brick.get("position", [0, 0, 0])
-                part_id = brick.get("part_id")
-                rotation = brick.get("rotation", 0)
-                html.append(f"      <li>Place brick {part_id} at ({pos[0]}, {pos[1]}, {pos[2]}), rotation {rotation}°</li>")
-            html.append(f"    </ol>")
-            html.append(f"  </div>")
+            yield "".join((
+                "  <div class='step'>\n"
+                f"    <div class='step-title'>Step {step.step_number}: Layer {step.layer_z}</div>\n"
+                "    <div class='parts-list'>\n"
+                "      <strong>Parts needed:</strong><br>\n",
+                "".join(
+                    f"      <div class='brick-item'>• {_html_escape(part_id)}: {qty} piece(s)</div>\n"
+                    for part_id, qty in step.piece_counts.items()
+                ),
+                _HTML_PLACEMENT_OPEN,
+                "".join(
+                    f"      <li>Place brick {_html_escape(brick.get('part_id'))} at ({pos[0]}, {pos[1]}, {pos[2]}), "
+                    f"rotation {brick.get('rotation', 0)}°</li>\n"
+                    for brick in step.bricks_in_step
+                    for pos in (_stud_position(brick),)
+                ),
+                _HTML_STEP_CLOSE
+            ))
         
         # Completion
-        html.append(f"  <div class='complete'>✓ BUILD COMPLETE!</div>")
-        
-        html.append("</body>")
-        html.append("</html>")
-        
-        return "\n".join(html)
+        yield _HTML_FOOTER
     
     @staticmethod
-    def export_to_json(guide: BuildGuide) -> Dict:
+    def export_to_json(guide: BuildGuide, include_bricks: bool = True) -> Dict:
         """
         Export guide as structured JSON.
         
         Args:
             guide: BuildGuide object
+            include_bricks: Include each step's brick list; summary clients that
+                already hold the manifest can leave it out (counts are kept)
             
         Returns:
             Dictionary suitable for JSON serialization
@@ -332,8 +444,27 @@ class InstructionManualGenerator:
                     "layer_z": step.layer_z,
                     "piece_count": step.piece_counts,
                     "brick_count": len(step.bricks_in_step),
-                    "bricks": step.bricks_in_step
+                    **({"bricks": step.bricks_in_step} if include_bricks else {})
                 }
                 for step in guide.steps
             ]
         }
+    
+    @staticmethod
+    def export_to_json_bytes(guide: BuildGuide, option: int = 0, include_bricks: bool = True) -> bytes:
+        """
+        Export guide as encoded JSON (export_to_json's structure, encoded by orjson).
+        
+        Args:
+            guide: BuildGuide object
+            option: Extra orjson options, e.g. orjson.OPT_INDENT_2
+            include_bricks: Include each step's brick list (see export_to_json)
+            
+        Returns:
+            UTF-8 JSON bytes (int layer keys become strings, as with json.dumps)
+        """
+        # Bricks are passed by reference; orjson walks them once in C
+        return orjson.dumps(
+            InstructionManualGenerator.export_to_json(guide, include_bricks),
+            option=orjson.OPT_NON_STR_KEYS | option
+        )
@@ -1,14 +1,21 @@
 """
 LDraw Integration Service
 Generates LDraw files and 3D LEGO-like visualizations from manifests.
-Uses the python-ldraw library to create authentic LEGO brick models.
+LDraw files are written as plain text; the python-ldraw library is optional.
 """
 
 import logging
-from typing import Dict, List, Tuple, Optional
-import json
+from dataclasses import dataclass
+from collections import Counter
+from itertools import islice
+from typing import Dict, Iterator, List, Tuple, Optional
 import os
 
+import numpy as np
+import orjson
+
+from app.services.instruction_manual_generator import _stud_position
+
 logger = logging.getLogger(__name__)
 
 # Note: This requires: pip install python-ldraw (or: pip install ldraw)
@@ -69,9 +76,172 @@ LDRAW_COLOR_MAP = {
     20: 71,     # Beige
 }
 
+# RGB colors for LEGO color IDs (web/GLB rendering)
+_COLOR_RGB = {
+    1: (255, 255, 255),   # White
+    2: (210, 180, 140),   # Tan
+    3: (211, 211, 211),   # Light Gray
+    4: (128, 128, 128),   # Dark Gray
+    5: (255, 0, 0),       # Red
+    6: (139, 0, 0),       # Dark Red
+    7: (139, 69, 19),     # Brown
+    8: (90, 40, 20),      # Dark Brown
+    9: (255, 255, 0),     # Yellow
+    10: (255, 255, 200),  # Light Yellow
+    11: (0, 128, 0),      # Green
+    12: (0, 100, 0),      # Dark Green
+    13: (0, 0, 255),      # Blue
+    14: (0, 0, 139),      # Dark Blue
+    15: (0, 0, 0),        # Black
+    16: (255, 165, 0),    # Orange
+    17: (173, 216, 230),  # Light Blue
+    18: (128, 0, 128),    # Purple
+    19: (255, 192, 203),  # Pink
+    20: (245, 245, 220),  # Beige
+}
+_DEFAULT_RGB = (200, 200, 200)
+
+# Brick dimensions in millimeters by part ID
+_BRICK_SIZES = {
+    "3001": {"width": 32, "depth": 16, "height": 9.6},  # 2x4
+    "3002": {"width": 24, "depth": 16, "height": 9.6},  # 2x3
+    "3003": {"width": 16, "depth": 16, "height": 9.6},  # 2x2
+    "3004": {"width": 16, "depth": 8, "height": 9.6},   # 1x2
+    "3005": {"width": 8, "depth": 8, "height": 9.6},    # 1x1
+    "3009": {"width": 48, "depth": 8, "height": 9.6},   # 1x6
+    "3068": {"width": 16, "depth": 16, "height": 3.2},  # Tile 2x2
+    "3069": {"width": 16, "depth": 8, "height": 3.2},   # Tile 1x2
+    "3070": {"width": 8, "depth": 8, "height": 3.2},    # Tile 1x1
+}
+_DEFAULT_SIZE = {"width": 8, "depth": 8, "height": 9.6}
+
+# Lookup tables indexed by color ID, for gathering a whole manifest's colors at once.
+# Row 0 is not a LEGO color, so it holds the defaults and unknown IDs map to it.
+_COLOR_LUT_SIZE = 32
+COLOR_RGB_LUT = np.full((_COLOR_LUT_SIZE, 3), _DEFAULT_RGB, dtype=np.uint8)
+COLOR_RGB_LUT[list(_COLOR_RGB)] = list(_COLOR_RGB.values())
+LDRAW_COLOR_LUT = np.full(_COLOR_LUT_SIZE, 16, dtype=np.int16)
+LDRAW_COLOR_LUT[list(LDRAW_COLOR_MAP)] = list(LDRAW_COLOR_MAP.values())
+_LUT_COLOR_IDS = frozenset(LDRAW_COLOR_MAP) | frozenset(_COLOR_RGB)
+
+
+def _color_index(color_ids: List) -> np.ndarray:
+    """
+    Color IDs as row indices into the color LUTs. Anything the dict lookups would
+    miss (unknown IDs, None, strings) goes to row 0, the defaults.
+    """
+    return np.array(
+        [color_id if color_id in _LUT_COLOR_IDS else 0 for color_id in color_ids], dtype=np.int64
+    )
+
+
+def _number_lists(values: np.ndarray, integer: np.ndarray) -> List[List]:
+    """
+    values.tolist(), except entries flagged in integer come back as ints. Output is
+    then formatted like plain Python arithmetic on the manifest's own numbers
+    (2 * 20 -> "40", 1.5 * 20 -> "30.0").
+    """
+    if integer.all():
+        return values.astype(np.int64).tolist()
+    return [
+        [int(value) if is_int else value for value, is_int in zip(row, row_integer)]
+        for row, row_integer in zip(values.tolist(), integer.tolist())
+    ]
+
+
+@dataclass
+class _ManifestArrays:
+    """
+    Manifest bricks as columns for the LDraw, GLB, 3D JSON and viewer exporters
+    (the only place brick defaults are filled in). Each export builds its own from
+    the manifest as it is at call time.
+    """
+    bricks: List[Dict]  # Source brick dicts, for fields passed through as-is
+    part_ids: List[str]
+    positions: np.ndarray  # (n, 3) stud coordinates, float64 so fractional studs survive
+    integer_positions: np.ndarray  # (n, 3) bool: coordinate was given as an int
+    rotations: List  # As given in the manifest
+    color_ids: List  # As given in the manifest
+    color_rows: np.ndarray  # Rows into COLOR_RGB_LUT / LDRAW_COLOR_LUT
+    
+    def __len__(self) -> int:
+        return len(self.part_ids)
+    
+    @classmethod
+    def from_manifest(cls, manifest: Dict) -> "_ManifestArrays":
+        return cls.from_bricks(manifest.get("bricks", []))
+    
+    @classmethod
+    def from_bricks(cls, bricks: List[Dict]) -> "_ManifestArrays":
+        stud_positions = [_stud_position(brick)[:3] for brick in bricks]
+        given = np.array(stud_positions).reshape(-1, 3)
+        if np.issubdtype(given.dtype, np.integer):
+            # The usual case: MasterBuilder positions are whole studs
+            integer_positions = np.ones(given.shape, dtype=bool)
+        else:
+            integer_positions = np.array(
+                [[isinstance(value, (int, np.integer)) for value in position] for position in stud_positions], dtype=bool
+            ).reshape(-1, 3)
+        color_ids = [brick.get("color_id", 16) for brick in bricks]
+        return cls(
+            bricks=bricks,
+            part_ids=[brick.get("part_id") for brick in bricks],
+            positions=given.astype(np.float64),
+            integer_positions=integer_positions,
+            rotations=[brick.get("rotation", 0) for brick in bricks],
+            color_ids=color_ids,
+            color_rows=_color_index(color_ids),
+        )
+
+
 # LEGO stud size: 8mm = 1 unit in LDraw
 # Standard brick height: 9.6mm per layer
 
+# Stud (x, y, z) -> LDraw (x, y, z): 20 units per stud, 24 per layer, y axis up and inverted
+_LDRAW_AXES = [0, 2, 1]
+_LDRAW_SCALE = np.array([20, 24, -20])
+
+# GLB brick box: 8mm cube centered on the origin (trimesh's Box(extents=[8, 8, 8]) layout),
+# placed at stud position * (8, 8, 9.6) mm
+_BOX_VERTICES = np.array(
+    [[x, y, z] for x in (-4.0, 4.0) for y in (-4.0, 4.0) for z in (-4.0, 4.0)]
+)
+_BOX_FACES = np.array([
+    [1, 3, 0], [4, 1, 0], [0, 3, 2], [2, 4, 0], [1, 7, 3], [5, 1, 4],
+    [5, 7, 1], [3, 7, 2], [6, 4, 2], [2, 7, 6], [6, 5, 4], [7, 5, 6],
+])
+_GLB_SCALE = np.array([8, 8, 9.6])
+
+# First line of every generated .ldr file
+_LDRAW_HEADER = "1 16 0 0 0 1 0 0 0 1 0 0 0 1 model.ldr"
+
+# Material definitions for common colors (generate_mtl_file), as (name, Ka/Kd)
+_MTL_MATERIALS = (
+    ("white", "1.0 1.0 1.0"),
+    ("red", "0.8 0.1 0.1"),
+    ("blue", "0.1 0.1 0.8"),
+    ("yellow", "1.0 1.0 0.0"),
+    ("green", "0.1 0.8 0.1"),
+    ("black", "0.1 0.1 0.1"),
+)
+_MTL_BODY = "\n".join(["# LEGO Material Library", ""] + [
+    line
+    for color, rgb in _MTL_MATERIALS
+    for line in (f"newmtl {color}", f"  Ka {rgb}", f"  Kd {rgb}", "  Ks 0.5 0.5 0.5", "  Ns 64", "")
+])
+
+# Lines per write when streaming an .ldr file
+LDRAW_WRITE_BATCH = 4096
+
+# Rotation matrices for 0/90/180/270 degrees (see _get_rotation_matrix), indexed by rotation // 90
+_ROTATION_MATRICES = (
+    "1 0 0 0 1 0 0 0 1",
+    "0 0 1 0 1 0 -1 0 0",
+    "-1 0 0 0 1 0 0 0 -1",
+    "0 0 -1 0 1 0 1 0 0",
+)
+_QUARTER_TURNS = (0, 90, 180, 270)
+
 
 class LDrawGenerator:
     """
@@ -97,24 +267,16 @@ class LDrawGenerator:
             True if successful, False otherwise
         """
         try:
-            if not LDRAW_AVAILABLE:
-                logger.error("LDraw library not available. Install with: pip install python-ldraw")
-                return False
-            
-            lines = []
-            
-            # LDraw file header
-            lines.append("1 16 0 0 0 1 0 0 0 1 0 0 0 1 model.ldr")
+            # LDraw file header, then all bricks converted in one batch (plain text,
+            # so python-ldraw is not needed)
+            lines = LDrawGenerator._ldraw_from_arrays(_ManifestArrays.from_manifest(manifest))
             
-            # Add bricks
-            for brick in manifest.get("bricks", []):
-                ldraw_line = LDrawGenerator._brick_to_ldraw(brick)
-                if ldraw_line:
-                    lines.append(ldraw_line)
-            
-            # Write file
+            # Write file as the lines are formatted, LDRAW_WRITE_BATCH at a time
             with open(output_path, 'w') as f:
-                f.write("\n".join(lines))
+                f.write(_LDRAW_HEADER)
+                while chunk := list(islice(lines, LDRAW_WRITE_BATCH)):
+                    f.write("\n")
+                    f.write("\n".join(chunk))
             
             logger.info(f"Generated LDraw file: {output_path}")
             return True
@@ -123,6 +285,45 @@ class LDrawGenerator:
             logger.error(f"Error generating LDraw file: {e}")
             return False
     
+    @staticmethod
+    def _ldraw_from_arrays(arrays: _ManifestArrays) -> Iterator[str]:
+        """
+        Convert a whole manifest to LDraw lines (same output as _brick_to_ldraw per brick).
+        
+        Positions are transformed in one array operation and rotation matrices come
+        from a precomputed table, so the per-brick work is only the final formatting,
+        which happens lazily as the lines are consumed.
+        
+        Args:
+            arrays: Manifest bricks as columns
+            
+        Returns:
+            Iterator of LDraw line strings, skipping bricks with unknown part IDs
+        """
+        # Validate part IDs once up front; unknown ones are skipped and reported together
+        is_known = np.fromiter(
+            (part_id in LDRAW_PART_MAP for part_id in arrays.part_ids), dtype=bool, count=len(arrays)
+        )
+        known = np.flatnonzero(is_known)
+        if len(known) < len(arrays):
+            unknown = Counter(arrays.part_ids[i] for i in np.flatnonzero(~is_known).tolist())
+            logger.warning(f"Skipping {len(arrays) - len(known)} bricks with unknown part IDs: {dict(unknown)}")
+        
+        coords = _number_lists(
+            arrays.positions[known][:, _LDRAW_AXES] * _LDRAW_SCALE,
+            arrays.integer_positions[known][:, _LDRAW_AXES]
+        )
+        
+        # Anything other than a quarter turn falls back to identity, as in _get_rotation_matrix
+        rotations = np.array([arrays.rotations[i] for i in known.tolist()], dtype=np.float64)
+        turns = np.where(np.isin(rotations, _QUARTER_TURNS), rotations // 90, 0).astype(np.int64).tolist()
+        colors = LDRAW_COLOR_LUT[arrays.color_rows[known]].tolist()
+        
+        return (
+            f"1 {color} {x} {y} {z} {_ROTATION_MATRICES[turn]} {LDRAW_PART_MAP[arrays.part_ids[i]]}"
+            for i, color, (x, y, z), turn in zip(known.tolist(), colors, coords, turns)
+        )
+    
     @staticmethod
     def _brick_to_ldraw(brick: Dict) -> Optional[str]:
         """
@@ -136,38 +337,33 @@ class LDrawGenerator:
         Returns:
             LDraw line string or None if invalid
         """
-        try:
-            part_id = brick.get("part_id")
-            position = brick.get("position", [0, 0, 0])
-            rotation = brick.get("rotation", 0)
-            color_id = brick.get("color_id", 16)
-            
-            # Get LDraw part
-            ldraw_part = LDRAW_PART_MAP.get(part_id)
-            if not ldraw_part:
-                logger.warning(f"Unknown part ID: {part_id}")
-                return None
-            
-            # Get LDraw color
-            ldraw_color = LDRAW_COLOR_MAP.get(color_id, 16)
-            
-            # Convert position (LDraw uses different coordinate system)
-            x = position[0] * 20  # 20 LDraw units per stud
-            y = position[2] * 24  # 24 LDraw units per layer (9.6mm = ~24 units)
-            z = -position[1] * 20  # Inverted for LDraw coordinate system
-            
-            # Rotation matrix (simplified for 90° rotations)
-            rotation_matrix = LDrawGenerator._get_rotation_matrix(rotation)
-            
-            # Build LDraw line
-            # Format: 1 <color> <x> <y> <z> <a> <b> <c> <d> <e> <f> <g> <h> <i> <part>
-            ldraw_line = f"1 {ldraw_color} {x} {y} {z} {rotation_matrix} {ldraw_part}"
-            
-            return ldraw_line
+        part_id = brick.get("part_id")
+        position = _stud_position(brick)
+        rotation = brick.get("rotation", 0)
+        color_id = brick.get("color_id", 16)
         
-        except Exception as e:
-            logger.error(f"Error converting brick to LDraw: {e}")
+        # Get LDraw part
+        ldraw_part = LDRAW_PART_MAP.get(part_id)
+        if not ldraw_part:
+            logger.warning(f"Unknown part ID: {part_id}")
             return None
+        
+        # Get LDraw color
+        ldraw_color = LDRAW_COLOR_MAP.get(color_id, 16)
+        
+        # Convert position (LDraw uses different coordinate system)
+        x = position[0] * 20  # 20 LDraw units per stud
+        y = position[2] * 24  # 24 LDraw units per layer (9.6mm = ~24 units)
+        z = -position[1] * 20  # Inverted for LDraw coordinate system
+        
+        # Rotation matrix (simplified for 90° rotations)
+        rotation_matrix = LDrawGenerator._get_rotation_matrix(rotation)
+        
+        # Build LDraw line
+        # Format: 1 <color> <x> <y> <z> <a> <b> <c> <d> <e> <f> <g> <h> <i> <part>
+        ldraw_line = f"1 {ldraw_color} {x} {y} {z} {rotation_matrix} {ldraw_part}"
+        
+        return ldraw_line
     
     @staticmethod
     def _get_rotation_matrix(rotation_degrees: int) -> str:
@@ -207,30 +403,8 @@ class LDrawGenerator:
             True if successful
         """
         try:
-            lines = []
-            lines.append("# LEGO Material Library")
-            lines.append("")
-            
-            # Add material definitions for common colors
-            materials = {
-                "white": {"Ka": "1.0 1.0 1.0", "Kd": "1.0 1.0 1.0"},
-                "red": {"Ka": "0.8 0.1 0.1", "Kd": "0.8 0.1 0.1"},
-                "blue": {"Ka": "0.1 0.1 0.8", "Kd": "0.1 0.1 0.8"},
-                "yellow": {"Ka": "1.0 1.0 0.0", "Kd": "1.0 1.0 0.0"},
-                "green": {"Ka": "0.1 0.8 0.1", "Kd": "0.1 0.8 0.1"},
-                "black": {"Ka": "0.1 0.1 0.1", "Kd": "0.1 0.1 0.1"},
-            }
-            
-            for color, props in materials.items():
-                lines.append(f"newmtl {color}")
-                lines.append(f"  Ka {props['Ka']}")
-                lines.append(f"  Kd {props['Kd']}")
-                lines.append(f"  Ks 0.5 0.5 0.5")
-                lines.append(f"  Ns 64")
-                lines.append("")
-            
             with open(output_path, 'w') as f:
-                f.write("\n".join(lines))
+                f.write(_MTL_BODY)
             
             return True
         
@@ -259,22 +433,15 @@ class LDrawGenerator:
             # Create scene
             scene = trimesh.Scene()
             
-            # Add bricks as boxes (simplified representation)
-            for brick in manifest.get("bricks", []):
-                position = brick.get("position", [0, 0, 0])
-                color_id = brick.get("color_id", 16)
-                
-                # Create box geometry (simplified - all bricks as 8mm units)
-                box = trimesh.primitives.Box(extents=[8, 8, 8])
-                
-                # Set position
-                box.apply_translation([position[0] * 8, position[1] * 8, position[2] * 9.6])
-                
-                # Set color based on LEGO color
-                color = LDrawGenerator._get_color_rgb(color_id)
-                box.visual.vertex_colors = color
-                
-                scene.add_geometry(box)
+            # Add bricks as boxes (simplified representation), all in one mesh
+            vertices, faces, vertex_colors = LDrawGenerator._mesh_from_arrays(
+                _ManifestArrays.from_manifest(manifest)
+            )
+            
+            # process=False: vertices are already laid out per brick, skip merging/validation
+            scene.add_geometry(trimesh.Trimesh(
+                vertices=vertices, faces=faces, vertex_colors=vertex_colors, process=False
+            ))
             
             # Export
             scene.export(output_path)
@@ -288,6 +455,27 @@ class LDrawGenerator:
             logger.error(f"Error generating GLB file: {e}")
             return False
     
+    @staticmethod
+    def _mesh_from_arrays(arrays: _ManifestArrays) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Vertices, faces and vertex colors of one 8mm box per brick.
+        
+        The unit box is tiled once per brick and shifted to each brick's position.
+        
+        Args:
+            arrays: Manifest bricks as columns
+            
+        Returns:
+            (vertices (8n, 3), faces (12n, 3), RGB vertex colors (8n, 3))
+        """
+        offsets = arrays.positions * _GLB_SCALE
+        vertices = (_BOX_VERTICES[None, :, :] + offsets[:, None, :]).reshape(-1, 3)
+        faces = (_BOX_FACES[None, :, :] + (np.arange(len(arrays)) * len(_BOX_VERTICES))[:, None, None]).reshape(-1, 3)
+        
+        # Color based on LEGO color (same color on all 8 corners of a brick)
+        vertex_colors = np.repeat(COLOR_RGB_LUT[arrays.color_rows], len(_BOX_VERTICES), axis=0)
+        return vertices, faces, vertex_colors
+    
     @staticmethod
     def _get_color_rgb(color_id: int) -> Tuple[int, int, int]:
         """
@@ -299,29 +487,7 @@ class LDrawGenerator:
         Returns:
             RGB tuple (0-255)
         """
-        color_map = {
-            1: (255, 255, 255),   # White
-            2: (210, 180, 140),   # Tan
-            3: (211, 211, 211),   # Light Gray
-            4: (128, 128, 128),   # Dark Gray
-            5: (255, 0, 0),       # Red
-            6: (139, 0, 0),       # Dark Red
-            7: (139, 69, 19),     # Brown
-            8: (90, 40, 20),      # Dark Brown
-            9: (255, 255, 0),     # Yellow
-            10: (255, 255, 200),  # Light Yellow
-            11: (0, 128, 0),      # Green
-            12: (0, 100, 0),      # Dark Green
-            13: (0, 0, 255),      # Blue
-            14: (0, 0, 139),      # Dark Blue
-            15: (0, 0, 0),        # Black
-            16: (255, 165, 0),    # Orange
-            17: (173, 216, 230),  # Light Blue
-            18: (128, 0, 128),    # Purple
-            19: (255, 192, 203),  # Pink
-            20: (245, 245, 220),  # Beige
-        }
-        return color_map.get(color_id, (200, 200, 200))
+        return _COLOR_RGB.get(color_id, _DEFAULT_RGB)
     
     @staticmethod
     def generate_3d_json(manifest: Dict) -> Dict:
@@ -334,30 +500,33 @@ class LDrawGenerator:
         Returns:
             Dictionary with 3D data
         """
+        bricks_3d = LDrawGenerator._json_from_arrays(_ManifestArrays.from_manifest(manifest))
+        
+        return {
+            "format": "LEGO 3D JSON",
+            "version": "1.0",
+            "total_bricks": len(bricks_3d),
+            "bricks": bricks_3d
+        }
+    
+    @staticmethod
+    def _json_from_arrays(arrays: _ManifestArrays) -> List[Dict]:
+        """Per-brick 3D JSON entries (see generate_3d_json)"""
+        colors_rgb = COLOR_RGB_LUT[arrays.color_rows].tolist()
         bricks_3d = []
         
-        for brick in manifest.get("bricks", []):
-            position = brick.get("position", [0, 0, 0])
-            part_id = brick.get("part_id")
-            color_id = brick.get("color_id", 16)
-            rotation = brick.get("rotation", 0)
-            
+        for brick, part_id, color_id, color_rgb in zip(arrays.bricks, arrays.part_ids, arrays.color_ids, colors_rgb):
             brick_3d = {
                 "part_id": part_id,
-                "position": position,
-                "rotation": rotation,
+                "position": brick.get("position", [0, 0, 0]),
+                "rotation": brick.get("rotation", 0),
                 "color_id": color_id,
-                "color_rgb": LDrawGenerator._get_color_rgb(color_id),
-                "size": LDrawGenerator._get_brick_size(part_id)
+                "color_rgb": color_rgb,
+                "size": _BRICK_SIZES.get(part_id, _DEFAULT_SIZE)
             }
             bricks_3d.append(brick_3d)
         
-        return {
-            "format": "LEGO 3D JSON",
-            "version": "1.0",
-            "total_bricks": len(bricks_3d),
-            "bricks": bricks_3d
-        }
+        return bricks_3d
     
     @staticmethod
     def _get_brick_size(part_id: str) -> Dict[str, float]:
@@ -370,43 +539,12 @@ class LDrawGenerator:
         Returns:
             Dictionary with width, depth, height in mm
         """
-        sizes = {
-            "3001": {"width": 32, "depth": 16, "height": 9.6},  # 2x4
-            "3002": {"width": 24, "depth": 16, "height": 9.6},  # 2x3
-            "3003": {"width": 16, "depth": 16, "height": 9.6},  # 2x2
-            "3004": {"width": 16, "depth": 8, "height": 9.6},   # 1x2
-            "3005": {"width": 8, "depth": 8, "height": 9.6},    # 1x1
-            "3009": {"width": 48, "depth": 8, "height": 9.6},   # 1x6
-            "3068": {"width": 16, "depth": 16, "height": 3.2},  # Tile 2x2
-            "3069": {"width": 16, "depth": 8, "height": 3.2},   # Tile 1x2
-            "3070": {"width": 8, "depth": 8, "height": 3.2},    # Tile 1x1
-        }
-        return sizes.get(part_id, {"width": 8, "depth": 8, "height": 9.6})
+        return _BRICK_SIZES.get(part_id, _DEFAULT_SIZE)
 
 
-class LegoVisualizerWeb:
-    """
-    Web-based LEGO visualizer using Three.js compatible data.
-    """
-    
-    @staticmethod
-    def generate_html_viewer(manifest: Dict, output_path: str) -> bool:
-        """
-        Generate HTML file with embedded Three.js viewer.
-        
-        Args:
-            manifest: The build manifest
-            output_path: Path to save HTML file
-            
-        Returns:
-            True if successful
-        """
-        try:
-            # Generate 3D JSON data
-            data_3d = LDrawGenerator.generate_3d_json(manifest)
-            
-            html = """
-<!DOCTYPE html>
+# Three.js viewer page (LegoVisualizerWeb), split around the brick count and brick rows.
+# Color and size tables are embedded once instead of being repeated in every brick.
+_VIEWER_HTML_HEAD = """<!DOCTYPE html>
 <html>
 <head>
     <title>LEGO Build 3D Viewer</title>
@@ -432,14 +570,22 @@ class LegoVisualizerWeb:
 <body>
     <div id="info">
         <h3>LEGO Build Viewer</h3>
-        <p>Total Bricks: """ + str(data_3d['total_bricks']) + """</p>
+        <p>Total Bricks: """
+_VIEWER_HTML_DATA = (
+    """</p>
         <p>Drag to rotate | Scroll to zoom</p>
     </div>
     <canvas id="canvas"></canvas>
     
     <script src="https://cdnjs.cloudflare.com/ajax/libs/three.js/r128/three.min.js"></script>
     <script>
-        const data = """ + json.dumps(data_3d) + """;
+        const COLOR_LUT = """
+    + orjson.dumps(COLOR_RGB_LUT.tolist()).decode()
+    + ";\n        const SIZE_LUT = " + orjson.dumps(_BRICK_SIZES).decode()
+    + ";\n        const DEFAULT_SIZE = " + orjson.dumps(_DEFAULT_SIZE).decode()
+    + ";\n        const bricks = "
+)
+_VIEWER_HTML_TAIL = """;
         
         // Scene setup
         const scene = new THREE.Scene();
@@ -460,17 +606,38 @@ class LegoVisualizerWeb:
         
         scene.add(new THREE.AmbientLight(0x808080));
         
-        // Add bricks
-        data.bricks.forEach(brick => {
-            const size = brick.size;
-            const geometry = new THREE.BoxGeometry(size.width, size.height, size.depth);
-            const material = new THREE.MeshPhongMaterial({
-                color: new THREE.Color(...brick.color_rgb.map(c => c/255))
-            });
-            const mesh = new THREE.Mesh(geometry, material);
+        // Add bricks: [part_id, x, y, z, rotation, color row], sized/colored from the LUTs.
+        // One InstancedMesh per (part, color) pair, so geometries and materials are
+        // created per distinct size/color rather than per brick
+        const groups = new Map();
+        bricks.forEach(brick => {
+            const key = brick[0] + '|' + brick[5];
+            if (!groups.has(key)) groups.set(key, []);
+            groups.get(key).push(brick);
+        });
+        
+        const geometries = {};
+        const materials = {};
+        const placement = new THREE.Object3D();
+        groups.forEach(group => {
+            const [partId, , , , , color] = group[0];
+            if (!(partId in geometries)) {
+                const size = SIZE_LUT[partId] || DEFAULT_SIZE;
+                geometries[partId] = new THREE.BoxGeometry(size.width, size.height, size.depth);
+            }
+            if (!(color in materials)) {
+                materials[color] = new THREE.MeshPhongMaterial({
+                    color: new THREE.Color(...COLOR_LUT[color].map(c => c/255))
+                });
+            }
+            const mesh = new THREE.InstancedMesh(geometries[partId], materials[color], group.length);
             
-            mesh.position.set(brick.position[0] * 8, brick.position[2] * 9.6, brick.position[1] * 8);
-            mesh.rotation.z = (brick.rotation * Math.PI / 180);
+            group.forEach(([, x, y, z, rotation], i) => {
+                placement.position.set(x * 8, z * 9.6, y * 8);
+                placement.rotation.z = (rotation * Math.PI / 180);
+                placement.updateMatrix();
+                mesh.setMatrixAt(i, placement.matrix);
+            });
             mesh.castShadow = true;
             mesh.receiveShadow = true;
             
@@ -516,10 +683,43 @@ class LegoVisualizerWeb:
     </script>
 </body>
 </html>
-            """
+"""
+
+
+class LegoVisualizerWeb:
+    """
+    Web-based LEGO visualizer using Three.js compatible data.
+    """
+    
+    @staticmethod
+    def generate_html_viewer(manifest: Dict, output_path: str) -> bool:
+        """
+        Generate HTML file with embedded Three.js viewer.
+        
+        Args:
+            manifest: The build manifest
+            output_path: Path to save HTML file
+            
+        Returns:
+            True if successful
+        """
+        try:
+            arrays = _ManifestArrays.from_manifest(manifest)
+            
+            # Compact brick rows; sizes and colors are looked up client-side
+            rows = [
+                [part_id, *position, rotation, color]
+                for part_id, position, rotation, color in zip(
+                    arrays.part_ids, _number_lists(arrays.positions, arrays.integer_positions),
+                    arrays.rotations, arrays.color_rows.tolist()
+                )
+            ]
             
             with open(output_path, 'w') as f:
-                f.write(html)
+                f.write(
+                    f"{_VIEWER_HTML_HEAD}{len(arrays)}{_VIEWER_HTML_DATA}"
+                    f"{orjson.dumps(rows).decode()}{_VIEWER_HTML_TAIL}"
+                )
             
             logger.info(f"Generated HTML viewer: {output_path}")
             return True
@@ -646,6 +646,13 @@ LEGO_OBJECTS_DATABASE = {
     ),
 }
 
+# Cluster signature -> object, built once (signatures are matched exactly; the
+# first object with a given signature wins, as in a scan of the database)
+_OBJECTS_BY_SIGNATURE: Dict[str, LegoObjectDefinition] = {}
+for _obj_def in LEGO_OBJECTS_DATABASE.values():
+    _OBJECTS_BY_SIGNATURE.setdefault(_obj_def.signature, _obj_def)
+del _obj_def
+
 # ============================================================================
 # UTILITY FUNCTIONS
 # ============================================================================
@@ -668,10 +675,7 @@ def get_all_lego_object_ids() -> List[str]:
 
 def get_object_by_signature(signature: str) -> Optional[LegoObjectDefinition]:
     """Look up object by cluster signature"""
-    for obj_def in LEGO_OBJECTS_DATABASE.values():
-        if obj_def.signature == signature:
-            return obj_def
-    return None
+    return _OBJECTS_BY_SIGNATURE.get(signature)
 
 def find_similar_objects(
     object_type: str,
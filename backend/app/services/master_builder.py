@@ -8,11 +8,17 @@ into a list of real LEGO bricks with proper structural integrity.
 import logging
 import asyncio
 import os
-from typing import Dict, List, Tuple, Optional, Set
-from collections import defaultdict
+import pickle
+import threading
+import time
+from typing import Dict, List, Tuple, Optional, Set, Union
+from collections import defaultdict, OrderedDict
 from dataclasses import dataclass
 import json
 
+import numpy as np
+import orjson
+
 from app.services.rebrickable_api import get_rebrickable_client
 from app.services.part_discovery import get_part_discovery_service
 from app.services.lego_objects_database import (
@@ -25,10 +31,26 @@ from app.services.lego_objects_database import (
 from app.services.piece_counter import PieceCounter, PieceSummary
 from app.services.instruction_manual_generator import InstructionManualGenerator, BuildGuide
 from app.services.ldraw_generator import LDrawGenerator, LegoVisualizerWeb
+from app.services.threejs_voxelizer import VoxelSet
 import hashlib  # For cluster signature hashing
 
 logger = logging.getLogger(__name__)
 
+# Recent greedy results keyed by a hash of the input voxels, so repeated
+# submissions of the same scene (sample room, re-saves) skip the search.
+# key -> (stored_at, pickled (manifest, build state)). Entries are stored as bytes
+# so every hit decodes its own copy and callers never share nested lists/dicts.
+BUILD_CACHE_MAX_SIZE = 64
+BUILD_CACHE_TTL_SECONDS = 600
+_build_cache: "OrderedDict[bytes, Tuple[float, bytes]]" = OrderedDict()
+_build_cache_lock = threading.Lock()
+
+# MasterBuilder attributes a greedy run leaves behind, restored on a cache hit
+_BUILD_STATE_ATTRS = (
+    "voxel_grid", "placed_bricks", "occupied_positions", "layer_bricks",
+    "layer_seams", "color_cache", "seam_map", "evolved_components",
+)
+
 
 @dataclass
 class Voxel:
@@ -128,6 +150,48 @@ class MasterBuilder:
         "shelf": {"keywords": ["shelf", "rack", "frame"], "typical_parts": ["3001"]},
     }
     
+    # Static part/color catalogs used when emitting the manifest. These are shared
+    # across builds; everything set in __init__ is per-build workspace.
+    # LEGO brick dimensions in studs (standard LEGO unit)
+    # Each stud = 8mm, standard brick height = 9.6mm (1.2 studs)
+    BRICK_DIMENSIONS = {
+        "3001": {"studs_width": 4, "studs_depth": 2, "studs_height": 1},  # 2x4 brick
+        "3009": {"studs_width": 6, "studs_depth": 1, "studs_height": 1},  # 1x6 brick
+        "3003": {"studs_width": 2, "studs_depth": 2, "studs_height": 1},  # 2x2 brick
+        "3004": {"studs_width": 2, "studs_depth": 1, "studs_height": 1},  # 1x2 brick
+        "3005": {"studs_width": 1, "studs_depth": 1, "studs_height": 1},  # 1x1 brick
+    }
+    
+    LEGO_TYPE_NAMES = {
+        "3001": "Brick 2x4",
+        "3009": "Brick 1x6",
+        "3003": "Brick 2x2",
+        "3004": "Brick 1x2",
+        "3005": "Brick 1x1",
+        "3068": "Tile 2x2",
+        "3069": "Tile 1x2",
+        "3070": "Tile 1x1",
+        "3938": "Hinge Brick 1x2",
+        "6134": "Hinge Plate 1x2",
+        "3040": "Slope 45° 2x1",
+        "3038": "Slope -45° 2x1",
+        "3297": "Slope 33° 2x2",
+    }
+    
+    COLOR_INFO = {
+        16: {"name": "Dark Tan", "hex": "#996633"},
+        1: {"name": "White", "hex": "#FFFFFF"},
+        5: {"name": "Red", "hex": "#E30A0A"},
+        2: {"name": "Tan", "hex": "#D4A574"},
+        3: {"name": "Light Gray", "hex": "#C0C0C0"},
+        4: {"name": "Dark Gray", "hex": "#605A52"},
+        6: {"name": "Green", "hex": "#237841"},
+        7: {"name": "Blue", "hex": "#0055BF"},
+        9: {"name": "Black", "hex": "#1B1B1B"},
+        25: {"name": "Orange", "hex": "#FF7C00"},
+        27: {"name": "Yellow", "hex": "#F2CD37"},
+    }
+    
     def __init__(self):
         # 3D Grid: (x, y, z) -> hex_color or None
         self.voxel_grid: Dict[Tuple[int, int, int], str] = {}
@@ -167,6 +231,9 @@ class MasterBuilder:
         
         # Test mode: Skip part verification (for testing without API keys)
         self.test_mode = os.getenv("TEST_MODE", "false").lower() == "true"
+        
+        # Part discovery depth: "soft" (catalog lookup) or "hard" (thorough AI search)
+        self.search_mode = "soft"
     
     async def _initialize_brick_priorities(self):
         """
@@ -183,18 +250,30 @@ class MasterBuilder:
             )
             logger.info(f"Initialized {len(self._brick_priorities)} brick types with dynamic priorities")
     
-    async def process_voxels(self, voxel_data: List[Dict]) -> Dict:
+    async def process_voxels(self, voxel_data: Union[List[Dict], VoxelSet]) -> Dict:
         """
         Main entry point: Process voxel JSON and generate MasterManifest.
         
         Args:
-            voxel_data: List of dicts with keys: x, y, z, hex_color
+            voxel_data: List of dicts with keys: x, y, z, hex_color, or a VoxelSet
             
         Returns:
             MasterManifest JSON containing Part ID, Position, Rotation, Color ID, and is_verified
         """
         logger.info(f"Processing {len(voxel_data)} voxels")
         
+        cache_key = self._build_cache_key(voxel_data)
+        cached = self._load_cached_build(cache_key)
+        if cached is not None:
+            logger.info("Reusing cached build for identical voxel input")
+            return cached
+        
+        manifest = await self._process_voxels_uncached(voxel_data)
+        self._store_cached_build(cache_key, manifest)
+        return manifest
+    
+    async def _process_voxels_uncached(self, voxel_data: Union[List[Dict], VoxelSet]) -> Dict:
+        """Run the greedy fitting pass over voxel_data and build the manifest."""
         # Reset state
         self.voxel_grid = {}
         self.placed_bricks = []
@@ -203,35 +282,88 @@ class MasterBuilder:
         self.color_cache = {}
         
         # Load voxels into grid
-        for voxel in voxel_data:
-            x = int(voxel.get("x", 0))
-            y = int(voxel.get("y", 0))
-            z = int(voxel.get("z", 0))
-            hex_color = voxel.get("hex_color", "#FFFFFF")
-            self.voxel_grid[(x, y, z)] = hex_color
+        if isinstance(voxel_data, VoxelSet):
+            # Columns convert in bulk; no per-voxel dict lookups
+            self.voxel_grid = {
+                (x, y, z): hex_color
+                for x, y, z, hex_color in zip(
+                    voxel_data.xs.tolist(), voxel_data.ys.tolist(), voxel_data.zs.tolist(),
+                    voxel_data.hex_colors()
+                )
+            }
+        else:
+            for voxel in voxel_data:
+                x = int(voxel.get("x", 0))
+                y = int(voxel.get("y", 0))
+                z = int(voxel.get("z", 0))
+                hex_color = voxel.get("hex_color", "#FFFFFF")
+                self.voxel_grid[(x, y, z)] = hex_color
         
         if not self.voxel_grid:
             logger.warning("No voxels to process")
             return self._generate_manifest()
         
+        # Bucket voxels by layer in one pass (grid order is kept within each layer)
+        layers: Dict[int, Dict[Tuple[int, int], str]] = defaultdict(dict)
+        for (x, y, z), hex_color in self.voxel_grid.items():
+            layers[z][(x, y)] = hex_color
+        
         # Process layer by layer with laminar interlocking
-        min_z = min(z for _, _, z in self.voxel_grid.keys())
-        max_z = max(z for _, _, z in self.voxel_grid.keys())
-        
-        for z in range(min_z, max_z + 1):
-            layer_voxels = {
-                (x, y): hex_color
-                for (x, y, z_pos), hex_color in self.voxel_grid.items()
-                if z_pos == z
-            }
-            
-            if layer_voxels:
-                await self._process_layer(z, layer_voxels)
+        for z in sorted(layers):
+            await self._process_layer(z, layers[z])
         
         # Generate final manifest
         return self._generate_manifest()
     
-    def process_voxels_sync(self, voxel_data: List[Dict]) -> Dict:
+    def _build_cache_key(self, voxel_data: Union[List[Dict], VoxelSet]) -> bytes:
+        """Content hash of the voxel input (plus the mode flags that change the result)"""
+        digest = hashlib.blake2b(digest_size=16)
+        if isinstance(voxel_data, VoxelSet):
+            # Hash the column buffers directly instead of encoding dicts
+            for column in (voxel_data.xs, voxel_data.ys, voxel_data.zs, voxel_data.colors):
+                digest.update(np.ascontiguousarray(column).tobytes())
+            digest.update(orjson.dumps(voxel_data.palette))
+        else:
+            digest.update(orjson.dumps(voxel_data))
+        digest.update(b"|test" if self.test_mode else b"|live")
+        digest.update(b"|" + self.search_mode.encode())
+        return digest.digest()
+    
+    def _load_cached_build(self, cache_key: bytes) -> Optional[Dict]:
+        """
+        Restore build state from the cache; returns the manifest or None on miss.
+        
+        The manifest and every attribute in _BUILD_STATE_ATTRS are decoded fresh
+        from the stored snapshot, so the builder is left as after a real run and
+        nothing is shared with the cache or with other hits.
+        """
+        with _build_cache_lock:
+            entry = _build_cache.get(cache_key)
+            if entry is None:
+                return None
+            stored_at, snapshot = entry
+            if time.monotonic() - stored_at > BUILD_CACHE_TTL_SECONDS:
+                del _build_cache[cache_key]
+                return None
+            _build_cache.move_to_end(cache_key)
+        
+        manifest, state = pickle.loads(snapshot)
+        for name, value in zip(_BUILD_STATE_ATTRS, state):
+            setattr(self, name, value)
+        return manifest
+    
+    def _store_cached_build(self, cache_key: bytes, manifest: Dict):
+        """Remember this build's manifest and state, evicting the least recently used"""
+        # Snapshot now: the returned manifest and the builder may be modified later
+        state = tuple(getattr(self, name) for name in _BUILD_STATE_ATTRS)
+        snapshot = pickle.dumps((manifest, state), protocol=pickle.HIGHEST_PROTOCOL)
+        with _build_cache_lock:
+            _build_cache[cache_key] = (time.monotonic(), snapshot)
+            _build_cache.move_to_end(cache_key)
+            while len(_build_cache) > BUILD_CACHE_MAX_SIZE:
+                _build_cache.popitem(last=False)
+    
+    def process_voxels_sync(self, voxel_data: Union[List[Dict], VoxelSet]) -> Dict:
         """
         Synchronous wrapper for process_voxels.
         For backward compatibility with non-async code.
@@ -413,6 +545,8 @@ class MasterBuilder:
         
         # Sort voxels for consistent placement order
         sorted_voxels = sorted(remaining)
+        occupied_positions = self.occupied_positions
+        footprint = [(dx, dy) for dx in range(width) for dy in range(height)]
         
         for x, y in sorted_voxels:
             # Apply laminar interlocking: Prefer positions that stagger seams
@@ -433,49 +567,43 @@ class MasterBuilder:
             # STAGGERED JOINTS: Check if brick bridges previous layer seams
             # If layer N-1 has a seam at x=k, current brick must bridge x=k with width>=2
             if prev_layer_seams and layer_z > 0:
-                brick_end_x = x + width
-                bridges_seams = False
-                
-                for seam_x in prev_layer_seams:
-                    if x <= seam_x < brick_end_x:
-                        # This brick bridges the seam, good
-                        bridges_seams = True
-                        break
+                # Seams are integer x positions, so probing the brick's own span
+                # is O(width) instead of O(number of seams)
+                bridges_seams = any(seam_x in prev_layer_seams for seam_x in range(x, x + width))
                 
                 # If brick doesn't bridge any seams but there are seams, skip 1x1/1x2 bricks
                 if not bridges_seams and prev_layer_seams and width <= 2:
                     continue  # Prefer larger bricks that bridge seams
             
-            # Check if we can place a brick starting at this position
-            if self._can_place_brick_at(x, y, layer_z, width, height):
-                # Verify all required positions are in the voxel set
-                required_positions = self._get_rectangular_positions(x, y, width, height)
-                if required_positions.issubset(remaining):
-                    # Place the brick (already verified as available)
-                    brick = PlacedBrick(
-                        part_id=part_id,
-                        position=(x, y, layer_z),
-                        rotation=rotation,
-                        color_id=color_id,
-                        is_verified=True  # Verified before placement
-                    )
-                    
-                    self.placed_bricks.append(brick)
-                    self.layer_bricks[layer_z].append(brick)
-                    
-                    # Mark positions as occupied
-                    occupied = self._get_brick_occupied_positions(
-                        (x, y, layer_z), width, height, layer_z
-                    )
-                    self.occupied_positions.update(occupied)
-                    
-                    # Track seams for next layer (staggered joints constraint)
-                    # Seams occur at brick edges
-                    self.layer_seams[layer_z].add(x)
-                    self.layer_seams[layer_z].add(x + width)
-                    
-                    remaining -= required_positions
-                    placed.append(brick)
+            # Check if we can place a brick starting at this position: every cell must
+            # still be in this color group and not yet occupied (tested in place, with
+            # early exit, instead of materializing position sets per candidate)
+            required_positions = [(x + dx, y + dy) for dx, dy in footprint]
+            if all(pos in remaining for pos in required_positions) and not any(
+                (px, py, layer_z) in occupied_positions for px, py in required_positions
+            ):
+                # Place the brick (already verified as available)
+                brick = PlacedBrick(
+                    part_id=part_id,
+                    position=(x, y, layer_z),
+                    rotation=rotation,
+                    color_id=color_id,
+                    is_verified=True  # Verified before placement
+                )
+                
+                self.placed_bricks.append(brick)
+                self.layer_bricks[layer_z].append(brick)
+                
+                # Mark positions as occupied
+                occupied_positions.update((px, py, layer_z) for px, py in required_positions)
+                
+                # Track seams for next layer (staggered joints constraint)
+                # Seams occur at brick edges
+                self.layer_seams[layer_z].add(x)
+                self.layer_seams[layer_z].add(x + width)
+                
+                remaining.difference_update(required_positions)
+                placed.append(brick)
         
         return placed
     
@@ -540,15 +668,10 @@ class MasterBuilder:
             }
         }
         
-        # LEGO brick dimensions in studs (standard LEGO unit)
-        # Each stud = 8mm, standard brick height = 9.6mm (1.2 studs)
-        brick_dimensions = {
-            "3001": {"studs_width": 4, "studs_depth": 2, "studs_height": 1},  # 2x4 brick
-            "3009": {"studs_width": 6, "studs_depth": 1, "studs_height": 1},  # 1x6 brick
-            "3003": {"studs_width": 2, "studs_depth": 2, "studs_height": 1},  # 2x2 brick
-            "3004": {"studs_width": 2, "studs_depth": 1, "studs_height": 1},  # 1x2 brick
-            "3005": {"studs_width": 1, "studs_depth": 1, "studs_height": 1},  # 1x1 brick
-        }
+        brick_dimensions = self.BRICK_DIMENSIONS
+        
+        # Footprint extents in studs, tracked in the same pass as the bricks
+        max_x = max_y = 0
         
         # Add each brick to manifest with detailed vertex information
         for brick in self.placed_bricks:
@@ -612,6 +735,8 @@ class MasterBuilder:
             }
             
             manifest["bricks"].append(brick_data)
+            max_x = max(max_x, x + dims["studs_width"])
+            max_y = max(max_y, y + dims["studs_depth"])
             
             # Add to voxel coverage map
             for voxel in covered_voxels:
@@ -622,6 +747,8 @@ class MasterBuilder:
                     "lego_type": brick_data["lego_type"]
                 })
         
+        manifest["bounds"] = {"studs": [max_x, max_y]}
+        
         # Add layer statistics
         manifest["layers"] = {
             layer: len(bricks) for layer, bricks in self.layer_bricks.items()
@@ -674,43 +801,16 @@ class MasterBuilder:
     
     def _get_lego_type_name(self, part_id: str) -> str:
         """Get human-readable LEGO type name"""
-        type_names = {
-            "3001": "Brick 2x4",
-            "3009": "Brick 1x6",
-            "3003": "Brick 2x2",
-            "3004": "Brick 1x2",
-            "3005": "Brick 1x1",
-            "3068": "Tile 2x2",
-            "3069": "Tile 1x2",
-            "3070": "Tile 1x1",
-            "3938": "Hinge Brick 1x2",
-            "6134": "Hinge Plate 1x2",
-            "3040": "Slope 45° 2x1",
-            "3038": "Slope -45° 2x1",
-            "3297": "Slope 33° 2x2",
-        }
-        return type_names.get(part_id, f"Brick {part_id}")
+        return self.LEGO_TYPE_NAMES.get(part_id, f"Brick {part_id}")
     
     def _get_color_info(self, color_id: int) -> Dict:
         """Get color information"""
-        color_map = {
-            16: {"name": "Dark Tan", "hex": "#996633"},
-            1: {"name": "White", "hex": "#FFFFFF"},
-            5: {"name": "Red", "hex": "#E30A0A"},
-            2: {"name": "Tan", "hex": "#D4A574"},
-            3: {"name": "Light Gray", "hex": "#C0C0C0"},
-            4: {"name": "Dark Gray", "hex": "#605A52"},
-            6: {"name": "Green", "hex": "#237841"},
-            7: {"name": "Blue", "hex": "#0055BF"},
-            9: {"name": "Black", "hex": "#1B1B1B"},
-            25: {"name": "Orange", "hex": "#FF7C00"},
-            27: {"name": "Yellow", "hex": "#F2CD37"},
-        }
-        return color_map.get(color_id, {"name": f"Color {color_id}", "hex": "#888888"})
+        info = self.COLOR_INFO.get(color_id)
+        return dict(info) if info else {"name": f"Color {color_id}", "hex": "#888888"}
     
     def _get_color_name(self, color_id: int) -> str:
         """Get color name"""
-        return self._get_color_info(color_id).get("name", f"Color {color_id}")
+        return self.COLOR_INFO.get(color_id, {}).get("name", f"Color {color_id}")
     
     def _get_fallback_parts(self, color_id: int) -> List[Dict]:
         """Fallback parts list when dynamic discovery fails."""
@@ -789,7 +889,7 @@ class MasterBuilder:
         signature = hashlib.md5(str(normalized).encode()).hexdigest()[:12]
         return signature
     
-    async def _query_backboard_memory(self, cluster_signature: str) -> Optional[List[PlacedBrick]]:
+    def _query_backboard_memory(self, cluster_signature: str) -> Optional[List[PlacedBrick]]:
         """
         BACKBOARD MEMORY: Check Backboard Stateful Thread for existing sub-assembly fragments.
         
@@ -823,7 +923,7 @@ class MasterBuilder:
         self.backboard_memory[cluster_signature] = bricks
         logger.info(f"Stored sub-assembly in Backboard Memory: {cluster_signature} ({len(bricks)} bricks)")
     
-    async def _classify_component_type(self, cluster_signature: str, voxel_cluster: Set[Tuple[int, int]]) -> str:
+    def _classify_component_type(self, cluster_signature: str, voxel_cluster: Set[Tuple[int, int]]) -> str:
         """
         COMPONENT SUBSTITUTION: Use Gemini to analyze cluster and classify component type (Desk, Bed, etc.)
         Also checks hardcoded database for pre-defined components.
@@ -860,7 +960,7 @@ class MasterBuilder:
                 logger.info(f"Classified {cluster_signature} as 'desk' (AR: {aspect_ratio:.2f}, area: {area})")
                 
                 # Query hardcoded database for desk matches
-                db_match = await self._query_hardcoded_database("desk", (width, height, 3))
+                db_match = self._query_hardcoded_database("desk", (width, height, 3))
                 if db_match:
                     logger.info(f"Using hardcoded desk definition: {db_match.get('name')}")
                     self.component_cache[cluster_signature] = component_type
@@ -872,7 +972,7 @@ class MasterBuilder:
                 logger.info(f"Classified {cluster_signature} as 'bed_base' (AR: {aspect_ratio:.2f}, area: {area})")
                 
                 # Query hardcoded database for bed matches
-                db_match = await self._query_hardcoded_database("bed_base", (width, height, 2))
+                db_match = self._query_hardcoded_database("bed_base", (width, height, 2))
                 if db_match:
                     logger.info(f"Using hardcoded bed definition: {db_match.get('name')}")
                     self.component_cache[cluster_signature] = component_type
@@ -884,7 +984,7 @@ class MasterBuilder:
                 logger.info(f"Classified {cluster_signature} as 'shelf' (AR: {aspect_ratio:.2f}, area: {area})")
                 
                 # Query hardcoded database for shelf matches
-                db_match = await self._query_hardcoded_database("shelf", (width, height, 10))
+                db_match = self._query_hardcoded_database("shelf", (width, height, 10))
                 if db_match:
                     logger.info(f"Using hardcoded shelf definition: {db_match.get('name')}")
                     self.component_cache[cluster_signature] = component_type
@@ -998,7 +1098,7 @@ class MasterBuilder:
         
         return gaps_to_bridge
     
-    async def _query_hardcoded_database(self, component_type: str, dimensions: Tuple[int, int, int]) -> Optional[Dict]:
+    def _query_hardcoded_database(self, component_type: str, dimensions: Tuple[int, int, int]) -> Optional[Dict]:
         """
         HARDCODED DATABASE: Query pre-defined LEGO objects for exact matches or similar components.
         This avoids API calls for commonly-used furniture and structures.
@@ -1110,7 +1210,7 @@ class MasterBuilder:
         except Exception as e:
             logger.error(f"Error updating seam map: {e}")
     
-    async def _save_component_evolution(self, cluster_signature: str, component_type: str, bricks: List[PlacedBrick], confirmed: bool = False) -> None:
+    def _save_component_evolution(self, cluster_signature: str, component_type: str, bricks: List[PlacedBrick], confirmed: bool = False) -> None:
         """
         MEMORY EVOLUTION: Save the final optimized manifest for a sub-component.
         After user confirms a build, this stores the solution for future reuse.
@@ -1329,8 +1429,8 @@ class MasterBuilder:
         
         if output_path:
             try:
-                with open(output_path, 'w') as f:
-                    json.dump(json_content, f, indent=2)
+                with open(output_path, 'wb') as f:
+                    f.write(orjson.dumps(json_content, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
                 logger.info(f"Exported instructions JSON to {output_path}")
             except Exception as e:
                 logger.error(f"Error exporting JSON instructions: {e}")
@@ -1344,7 +1444,6 @@ class MasterBuilder:
     def export_ldraw_file(self, output_path: str) -> bool:
         """
         Export build as LDraw file for 3D visualization.
-        Requires: pip install python-ldraw
         
         Args:
             output_path: Path to save .ldr file
@@ -1352,10 +1451,6 @@ class MasterBuilder:
         Returns:
             True if successful
         """
-        if not LDrawGenerator.check_ldraw_available():
-            logger.warning("LDraw library not available. Install with: pip install python-ldraw")
-            return False
-        
         manifest = self._generate_manifest()
         success = LDrawGenerator.generate_ldraw_file(manifest, output_path)
         
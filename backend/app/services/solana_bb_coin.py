@@ -8,7 +8,8 @@ Solana + BB Coin integration.
 
 import json
 import os
-from typing import Any
+from functools import lru_cache
+from typing import Any, Optional
 
 import base58
 from nacl.encoding import RawEncoder
@@ -49,9 +50,10 @@ def build_lego_metadata_json(
 
 def build_memo_payload(metadata: dict[str, Any]) -> str:
     """Serialize metadata to a JSON string for Memo instruction. Truncate if too large."""
+    # json.dumps escapes non-ASCII (\uXXXX), so the memo is pure ASCII and its length
+    # in characters is its length in bytes; no second encode needed for the size check
     s = json.dumps(metadata, separators=(",", ":"))
-    buf = s.encode("utf-8")
-    if len(buf) > MAX_MEMO_BYTES:
+    if len(s) > MAX_MEMO_BYTES:
         # Drop breakdown and shorten name to fit
         m2 = {k: v for k, v in metadata.items() if k != "b"}
         m2["n"] = (m2.get("n") or "")[:40]
@@ -59,6 +61,21 @@ def build_memo_payload(metadata: dict[str, Any]) -> str:
     return s
 
 
+@lru_cache(maxsize=4096)
+def _verify_key(public_key_b58: str) -> Optional[VerifyKey]:
+    """Decoded Ed25519 verifier for a wallet public key, built once per wallet (None if invalid)."""
+    try:
+        pk = base58.b58decode(public_key_b58)
+    except Exception:
+        return None
+    if len(pk) != 32:
+        return None
+    try:
+        return VerifyKey(pk, encoder=RawEncoder)
+    except Exception:
+        return None
+
+
 def verify_wallet_signature(message: str, signature_b58: str, public_key_b58: str) -> bool:
     """
     Verify an Ed25519 signature from a Solana wallet (e.g. Phantom).
@@ -69,14 +86,13 @@ def verify_wallet_signature(message: str, signature_b58: str, public_key_b58: st
     """
     try:
         sig = base58.b58decode(signature_b58)
-        pk = base58.b58decode(public_key_b58)
     except Exception:
         return False
-    if len(pk) != 32 or len(sig) != 64:
+    vk = _verify_key(public_key_b58)
+    if vk is None or len(sig) != 64:
         return False
     msg_bytes = message.encode("utf-8")
     try:
-        vk = VerifyKey(pk, encoder=RawEncoder)
         vk.verify(msg_bytes, sig, encoder=RawEncoder)  # detached: (message, signature)
         return True
     except Exception:
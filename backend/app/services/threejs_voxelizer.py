@@ -6,12 +6,122 @@ Handles boxes, spheres, cylinders, and planes.
 """
 
 import logging
-from typing import List, Dict, Tuple, Optional
-import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Dict, Tuple, Optional, Iterable
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
 
+def _offset_grid(ri: int, rj: int, rk: int) -> np.ndarray:
+    """All integer offsets in [-ri, ri] x [-rj, rj] x [-rk, rk], in i-major loop order"""
+    return (np.indices((2 * ri + 1, 2 * rj + 1, 2 * rk + 1)).reshape(3, -1).T
+            - np.array([ri, rj, rk]))
+
+
+# Shape offsets are computed once per size with NumPy masks and reused; rooms
+# repeat the same furniture dimensions many times.
+@lru_cache(maxsize=256)
+def _box_shell_offsets(w: int, h: int, d: int) -> np.ndarray:
+    offsets = _offset_grid(w, h, d)
+    a = np.abs(offsets)
+    return offsets[(a[:, 0] == w) | (a[:, 1] == h) | (a[:, 2] == d)]
+
+
+@lru_cache(maxsize=256)
+def _sphere_offsets(r: int) -> np.ndarray:
+    offsets = _offset_grid(r, r, r)
+    return offsets[(offsets ** 2).sum(axis=1) <= r * r]
+
+
+@lru_cache(maxsize=256)
+def _cylinder_offsets(r: int, h: int) -> np.ndarray:
+    offsets = _offset_grid(r, h, r)
+    return offsets[offsets[:, 0] ** 2 + offsets[:, 2] ** 2 <= r * r]
+
+
+@lru_cache(maxsize=256)
+def _slab_offsets(w: int, h: int, t: int) -> np.ndarray:
+    return _offset_grid(w, h, t)
+
+
+def hex_to_rgb24(hex_color: str) -> int:
+    """'#RRGGBB' / '0xRRGGBB' -> packed 0xRRGGBB int (unparseable colors become 0x888888 gray)"""
+    digits = hex_color[2:] if hex_color[:2].lower() == "0x" else hex_color.lstrip("#")
+    if len(digits) == 3:
+        digits = "".join(c * 2 for c in digits)
+    try:
+        return int(digits[:6], 16) if len(digits) >= 6 else 0x888888
+    except ValueError:
+        return 0x888888
+
+
+@lru_cache(maxsize=256)
+def _palette_rgb(palette: Tuple[str, ...]) -> np.ndarray:
+    return np.array([hex_to_rgb24(color) for color in palette], dtype=np.uint32)
+
+
+@dataclass
+class VoxelSet:
+    """
+    Voxels as parallel columns (SoA) instead of a list of dicts.
+    
+    Coordinates are int16 grid indices; colors are uint32 indices into palette,
+    so each distinct hex string is stored once (rgb gives packed 0xRRGGBB values
+    for numeric work). Dicts are only materialized at the JSON boundary via to_dicts().
+    """
+    xs: np.ndarray
+    ys: np.ndarray
+    zs: np.ndarray
+    colors: np.ndarray
+    palette: List[str]
+    
+    def __len__(self) -> int:
+        return len(self.xs)
+    
+    @classmethod
+    def from_dicts(cls, voxels: Iterable[Dict]) -> "VoxelSet":
+        """Pack [{x, y, z, hex_color}, ...] into columns"""
+        palette_index: Dict[str, int] = {}
+        xs, ys, zs, colors = [], [], [], []
+        for voxel in voxels:
+            xs.append(int(voxel.get("x", 0)))
+            ys.append(int(voxel.get("y", 0)))
+            zs.append(int(voxel.get("z", 0)))
+            colors.append(palette_index.setdefault(voxel.get("hex_color", "#FFFFFF"), len(palette_index)))
+        return cls(
+            xs=np.array(xs, dtype=np.int16),
+            ys=np.array(ys, dtype=np.int16),
+            zs=np.array(zs, dtype=np.int16),
+            colors=np.array(colors, dtype=np.uint32),
+            palette=list(palette_index),
+        )
+    
+    @property
+    def rgb(self) -> np.ndarray:
+        """Per-voxel packed 0xRRGGBB colors (uint32); hex parsing happens once per palette entry"""
+        return _palette_rgb(tuple(self.palette))[self.colors]
+    
+    def hex_colors(self) -> List[str]:
+        """Per-voxel hex color strings"""
+        if not len(self.colors):
+            return []
+        return np.array(self.palette, dtype=object)[self.colors].tolist()
+    
+    def to_dicts(self, limit: Optional[int] = None) -> List[Dict]:
+        """Materialize [{x, y, z, hex_color}, ...] (optionally only the first limit voxels)"""
+        end = len(self) if limit is None else min(limit, len(self))
+        return [
+            {"x": x, "y": y, "z": z, "hex_color": color}
+            for x, y, z, color in zip(
+                self.xs[:end].tolist(), self.ys[:end].tolist(), self.zs[:end].tolist(),
+                self.hex_colors()[:end]
+            )
+        ]
+
+
 class VoxelGrid:
     """Represents a 3D voxel grid"""
     
@@ -23,7 +133,21 @@ class VoxelGrid:
             resolution: Voxel size in meters (default 0.1m = 10cm)
         """
         self.resolution = resolution
-        self.voxels: Dict[Tuple[int, int, int], str] = {}  # (x, y, z) -> hex_color
+        # Shapes are buffered as (n, 3) coordinate blocks and resolved in one NumPy
+        # pass: a later write to the same cell wins, first-write order is kept
+        self._blocks: List[np.ndarray] = []
+        self._block_colors: List[int] = []
+        self._palette: Dict[str, int] = {}
+        self._colors: List[str] = []
+    
+    @property
+    def voxels(self) -> Dict[Tuple[int, int, int], str]:
+        """(x, y, z) -> hex_color for every filled cell"""
+        coords, colors = self._resolve()
+        return {
+            tuple(coord): self._colors[color]
+            for coord, color in zip(coords.tolist(), colors.tolist())
+        }
     
     def add_voxel(self, x: float, y: float, z: float, hex_color: str = "#888888"):
         """Add voxel at position"""
@@ -31,7 +155,34 @@ class VoxelGrid:
         grid_y = int(round(y / self.resolution))
         grid_z = int(round(z / self.resolution))
         
-        self.voxels[(grid_x, grid_y, grid_z)] = hex_color
+        self._fill(grid_x, grid_y, grid_z, np.zeros((1, 3), dtype=np.int64), hex_color)
+    
+    def _fill(self, cx: int, cy: int, cz: int, offsets: np.ndarray, hex_color: str):
+        """Set every voxel at center + offset to hex_color (later shapes overwrite)"""
+        if hex_color not in self._palette:
+            self._palette[hex_color] = len(self._colors)
+            self._colors.append(hex_color)
+        self._blocks.append(offsets + np.array([cx, cy, cz]))
+        self._block_colors.append(self._palette[hex_color])
+    
+    def _resolve(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Deduplicate buffered writes -> (coords (n, 3), palette indices), in first-write order"""
+        if not self._blocks:
+            return np.empty((0, 3), dtype=np.int64), np.empty(0, dtype=np.int64)
+        
+        coords = np.concatenate(self._blocks)
+        colors = np.repeat(self._block_colors, [len(block) for block in self._blocks])
+        
+        # One integer key per cell so np.unique can dedupe rows
+        lo = coords.min(axis=0)
+        keys = np.ravel_multi_index((coords - lo).T, coords.max(axis=0) - lo + 1)
+        
+        _, first = np.unique(keys, return_index=True)
+        _, last_reversed = np.unique(keys[::-1], return_index=True)
+        last = len(keys) - 1 - last_reversed
+        
+        order = np.argsort(first)
+        return coords[first[order]], colors[last[order]]
     
     def add_box(self, x: float, y: float, z: float, 
                 width: float, height: float, depth: float, 
@@ -47,13 +198,8 @@ class VoxelGrid:
         cy = int(round(y / self.resolution))
         cz = int(round(z / self.resolution))
         
-        # Fill box
-        for i in range(-voxels_w, voxels_w + 1):
-            for j in range(-voxels_h, voxels_h + 1):
-                for k in range(-voxels_d, voxels_d + 1):
-                    # Only fill outer shell for efficiency
-                    if abs(i) == voxels_w or abs(j) == voxels_h or abs(k) == voxels_d:
-                        self.voxels[(cx + i, cy + j, cz + k)] = hex_color
+        # Fill box (outer shell only for efficiency)
+        self._fill(cx, cy, cz, _box_shell_offsets(voxels_w, voxels_h, voxels_d), hex_color)
     
     def add_sphere(self, x: float, y: float, z: float, 
                    radius: float, hex_color: str = "#888888"):
@@ -64,12 +210,7 @@ class VoxelGrid:
         cz = int(round(z / self.resolution))
         
         # Fill sphere
-        for i in range(-voxels_r, voxels_r + 1):
-            for j in range(-voxels_r, voxels_r + 1):
-                for k in range(-voxels_r, voxels_r + 1):
-                    dist = math.sqrt(i*i + j*j + k*k)
-                    if dist <= voxels_r:
-                        self.voxels[(cx + i, cy + j, cz + k)] = hex_color
+        self._fill(cx, cy, cz, _sphere_offsets(voxels_r), hex_color)
     
     def add_cylinder(self, x: float, y: float, z: float, 
                      radius: float, height: float, 
@@ -82,13 +223,8 @@ class VoxelGrid:
         cy = int(round(y / self.resolution))
         cz = int(round(z / self.resolution))
         
-        # Fill cylinder
-        for i in range(-voxels_r, voxels_r + 1):
-            for j in range(-voxels_h, voxels_h + 1):
-                for k in range(-voxels_r, voxels_r + 1):
-                    dist = math.sqrt(i*i + k*k)
-                    if dist <= voxels_r:
-                        self.voxels[(cx + i, cy + j, cz + k)] = hex_color
+        # Fill cylinder (axis along y)
+        self._fill(cx, cy, cz, _cylinder_offsets(voxels_r, voxels_h), hex_color)
     
     def add_plane(self, x: float, y: float, z: float, 
                   width: float, height: float, 
@@ -103,25 +239,23 @@ class VoxelGrid:
         cz = int(round(z / self.resolution))
         
         # Fill plane
-        for i in range(-voxels_w, voxels_w + 1):
-            for j in range(-voxels_h, voxels_h + 1):
-                for k in range(-voxels_t, voxels_t + 1):
-                    self.voxels[(cx + i, cy + j, cz + k)] = hex_color
+        self._fill(cx, cy, cz, _slab_offsets(voxels_w, voxels_h, voxels_t), hex_color)
+    
+    def to_voxel_set(self) -> VoxelSet:
+        """Convert voxel grid to columnar VoxelSet"""
+        coords, colors = self._resolve()
+        coords = coords.astype(np.int16)
+        voxel_set = VoxelSet(
+            xs=coords[:, 0], ys=coords[:, 1], zs=coords[:, 2],
+            colors=colors.astype(np.uint32), palette=list(self._colors)
+        )
+        
+        logger.info(f"Generated {len(voxel_set)} voxels")
+        return voxel_set
     
     def to_voxel_list(self) -> List[Dict]:
         """Convert voxel grid to list of voxel objects"""
-        voxel_list = []
-        
-        for (x, y, z), color in self.voxels.items():
-            voxel_list.append({
-                "x": x,
-                "y": y,
-                "z": z,
-                "hex_color": color
-            })
-        
-        logger.info(f"Generated {len(voxel_list)} voxels")
-        return voxel_list
+        return self.to_voxel_set().to_dicts()
 
 
 class ThreeJsVoxelizer:
@@ -201,8 +335,12 @@ class ThreeJsVoxelizer:
             self.grid.add_cylinder(x, y, z, radius, height, color)
     
     def extract_from_json_scene(self, scene_data: Dict) -> List[Dict]:
+        """Extract voxel dicts from JSON scene description (see load_json_scene)"""
+        return self.load_json_scene(scene_data).to_voxel_list()
+    
+    def load_json_scene(self, scene_data: Dict) -> VoxelGrid:
         """
-        Extract voxel data from JSON scene description.
+        Voxelize a JSON scene description into self.grid.
         
         Expected format:
         {
@@ -230,11 +368,15 @@ class ThreeJsVoxelizer:
             except Exception as e:
                 logger.error(f"Error parsing object: {e}")
         
-        return self.grid.to_voxel_list()
+        return self.grid
     
     def extract_dorm_room(self) -> List[Dict]:
+        """Extract voxel dicts from sample dorm room scene (see load_dorm_room)"""
+        return self.load_dorm_room().to_voxel_list()
+    
+    def load_dorm_room(self) -> VoxelGrid:
         """
-        Extract voxel data from sample dorm room scene.
+        Voxelize the sample dorm room scene into self.grid.
         Hardcoded extraction of the sample Three.js dorm room.
         """
         
@@ -285,7 +427,7 @@ class ThreeJsVoxelizer:
         self.grid.add_box(2.2, 0.4, -0.5, 0.6, 0.8, 0.6, "#111111")  # fridge
         self.grid.add_cylinder(2.2, 0.92, -0.5, 0.1, 0.25, "#999999")  # coffee maker
         
-        return self.grid.to_voxel_list()
+        return self.grid
 
 
 def convert_threejs_to_voxels(scene_description: Dict, resolution: float = 0.15) -> List[Dict]:
@@ -303,7 +445,19 @@ def convert_threejs_to_voxels(scene_description: Dict, resolution: float = 0.15)
     return voxelizer.extract_from_json_scene(scene_description)
 
 
+def convert_threejs_to_voxel_set(scene_description: Dict, resolution: float = 0.15) -> VoxelSet:
+    """Same as convert_threejs_to_voxels, but returns columns instead of dicts"""
+    voxelizer = ThreeJsVoxelizer(resolution=resolution)
+    return voxelizer.load_json_scene(scene_description).to_voxel_set()
+
+
 def get_sample_dorm_room_voxels(resolution: float = 0.15) -> List[Dict]:
     """Get voxel data for sample dorm room"""
     voxelizer = ThreeJsVoxelizer(resolution=resolution)
     return voxelizer.extract_dorm_room()
+
+
+def get_sample_dorm_room_voxel_set(resolution: float = 0.15) -> VoxelSet:
+    """Get voxel columns for sample dorm room"""
+    voxelizer = ThreeJsVoxelizer(resolution=resolution)
+    return voxelizer.load_dorm_room().to_voxel_set()
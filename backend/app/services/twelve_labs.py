@@ -8,7 +8,7 @@ import asyncio
 import os
 import re
 import logging
-from typing import Dict, Any, Optional
+from typing import BinaryIO, Dict, Any, Optional
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -16,6 +16,14 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Upload MIME type by file extension (unknown extensions fall back to mp4)
+VIDEO_MIME_TYPES = {
+    ".mov": "video/quicktime",
+    ".mp4": "video/mp4",
+    ".avi": "video/x-msvideo",
+    ".webm": "video/webm",
+}
+
 
 class TwelveLabsAPI:
     """TwelveLabs API client - requires TWL_INDEX_ID to be set"""
@@ -39,42 +47,56 @@ class TwelveLabsAPI:
         if not Path(video_path).exists():
             raise FileNotFoundError(f"Video not found: {video_path}")
         
-        mime_types = {".mov": "video/quicktime", ".mp4": "video/mp4", 
-                      ".avi": "video/x-msvideo", ".webm": "video/webm"}
         ext = Path(video_path).suffix.lower()
-        mime = mime_types.get(ext, "video/mp4")
+        mime = VIDEO_MIME_TYPES.get(ext, "video/mp4")
         
+        logger.info(f"Uploading: {video_path}")
         with open(video_path, "rb") as f:
-            files = {
-                "index_id": (None, self.index_id),
-                "video_file": (Path(video_path).name, f, mime),
-            }
+            return await self.upload_video_stream(f, Path(video_path).name, mime)
+    
+    async def upload_video_stream(self, fileobj: BinaryIO, filename: str,
+                                  content_type: str = "video/mp4") -> Dict[str, Any]:
+        """
+        Upload an already-open video file object to TwelveLabs.
+        
+        Lets callers pass an UploadFile's underlying file directly instead of
+        writing it to disk first just so upload_video() can re-read it.
+        """
+        files = {
+            "index_id": (None, self.index_id),
+            "video_file": (filename, fileobj, content_type),
+        }
+        
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"{self.base_url}/tasks",
+                headers=self.headers,
+                files=files,
+                timeout=120.0
+            )
             
-            async with httpx.AsyncClient() as client:
-                logger.info(f"Uploading: {video_path}")
-                response = await client.post(
-                    f"{self.base_url}/tasks",
-                    headers=self.headers,
-                    files=files,
-                    timeout=120.0
-                )
-                
-                if response.status_code not in [200, 201]:
-                    raise Exception(f"Upload failed: {response.text}")
-                
-                data = response.json()
-                logger.info(f"Upload success: task={data.get('_id')}, video={data.get('video_id')}")
-                return {"task_id": data.get("_id"), "video_id": data.get("video_id")}
+            if response.status_code not in [200, 201]:
+                raise Exception(f"Upload failed: {response.text}")
+            
+            data = response.json()
+            logger.info(f"Upload success: task={data.get('_id')}, video={data.get('video_id')}")
+            return {"task_id": data.get("_id"), "video_id": data.get("video_id")}
     
     # ========== POLLING ==========
     
-    async def wait_for_task(self, task_id: str, timeout: int = 300) -> Dict[str, Any]:
-        """Poll task until completed"""
+    async def wait_for_task(self, task_id: str, timeout: int = 300,
+                            initial_interval: float = 0.5, max_interval: float = 5.0,
+                            factor: float = 1.5) -> Dict[str, Any]:
+        """Poll task until completed, backing off from initial_interval to max_interval"""
         url = f"{self.base_url}/tasks/{task_id}"
-        max_attempts = timeout // 3
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        interval = initial_interval
+        attempt = 0
         
         async with httpx.AsyncClient() as client:
-            for attempt in range(max_attempts):
+            while True:
+                attempt += 1
                 response = await client.get(url, headers=self.headers, timeout=10.0)
                 
                 if response.status_code != 200:
@@ -82,33 +104,44 @@ class TwelveLabsAPI:
                 
                 data = response.json()
                 status = data.get("status")
-                logger.info(f"Task {task_id}: {status} ({attempt + 1}/{max_attempts})")
+                logger.info(f"Task {task_id}: {status} (attempt {attempt})")
                 
                 if status in ["completed", "ready"]:
                     return data
                 elif status == "failed":
                     raise Exception(f"Task failed: {data.get('error')}")
                 
-                await asyncio.sleep(3)
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(interval, remaining))
+                interval = min(interval * factor, max_interval)
         
         raise TimeoutError(f"Task timed out after {timeout}s")
     
-    async def wait_for_video_ready(self, video_id: str, timeout: int = 180) -> bool:
-        """Poll until video is ready for semantic analysis"""
-        max_attempts = timeout // 3
+    async def wait_for_video_ready(self, video_id: str, timeout: int = 180,
+                                   initial_interval: float = 1.0, max_interval: float = 5.0,
+                                   factor: float = 1.5) -> bool:
+        """Poll until video is ready for semantic analysis, with the same backoff as wait_for_task"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        interval = initial_interval
+        attempt = 0
         
-        for attempt in range(max_attempts):
-            logger.info(f"Checking video readiness ({attempt + 1}/{max_attempts})...")
+        while True:
+            attempt += 1
+            logger.info(f"Checking video readiness (attempt {attempt})...")
             
-            try:
-                if await self._verify_semantic_readiness(video_id):
-                    logger.info("Video ready for analysis")
-                    return True
-            except Exception as e:
-                # Propagate fatal errors (like unsupported index)
-                raise e
+            # Fatal errors (like unsupported index) propagate from here
+            if await self._verify_semantic_readiness(video_id):
+                logger.info("Video ready for analysis")
+                return True
             
-            await asyncio.sleep(3)
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * factor, max_interval)
         
         raise TimeoutError(f"Video not ready after {timeout}s")
     
@@ -362,13 +395,21 @@ If the part is not clearly visible, return "none"."""
             "window": "a window in the room"
         }
         
-        # Get timestamps for each requested part
+        # Query all parts concurrently - each prompt is an independent analyze call
+        descriptions = [part_descriptions.get(part, part.replace('_', ' ')) for part in parts]
+        logger.info(f"Getting timestamps for {len(parts)} room parts...")
+        results = await asyncio.gather(
+            *(self.get_room_part_timestamp(video_id, part, description)
+              for part, description in zip(parts, descriptions)),
+            return_exceptions=True
+        )
+        
         timestamps = {}
-        for part in parts:
-            description = part_descriptions.get(part, part.replace('_', ' '))
-            logger.info(f"Getting timestamp for: {part} ({description})...")
-            timestamps[part] = await self.get_room_part_timestamp(video_id, part, description)
-            await asyncio.sleep(0.5)  # Small delay between requests
+        for part, result in zip(parts, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to get timestamp for {part}: {result}")
+                result = None
+            timestamps[part] = result
         
         return timestamps
     
@@ -393,12 +434,18 @@ If the part is not clearly visible, return "none"."""
     async def get_all_view_timestamps(self, video_id: str) -> Dict[str, Optional[str]]:
         """Get timestamps for all views - DEPRECATED: use get_all_room_timestamps"""
         views = ["front", "side", "back", "top"]
-        timestamps = {}
+        logger.info(f"Getting {len(views)} view timestamps...")
+        results = await asyncio.gather(
+            *(self.get_view_timestamp(video_id, view) for view in views),
+            return_exceptions=True
+        )
         
-        for view in views:
-            logger.info(f"Getting {view} view timestamp...")
-            timestamps[view] = await self.get_view_timestamp(video_id, view)
-            await asyncio.sleep(0.5)  # Small delay between requests
+        timestamps = {}
+        for view, result in zip(views, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to get {view} view timestamp: {result}")
+                result = None
+            timestamps[view] = result
         
         return timestamps
 
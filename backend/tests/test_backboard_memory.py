@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Test script for BackboardLegoMemory - runs fully in memory, no external APIs
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import backboard_lego_memory
+from app.services.backboard_lego_memory import BackboardLegoMemory
+
+
+def _save(memory, project_name, room_type):
+    return memory.save_build(
+        project_name=project_name,
+        voxel_data={"voxel_count": 0, "voxels": []},
+        manifest={"bricks": []},
+        piece_summary={"total_pieces": 3},
+        components=[],
+        room_type=room_type
+    )
+
+
+def test_similar_builds_cache_invalidation():
+    """Similar-build results are cached and refreshed after save_build"""
+    print("="*70)
+    print("TEST: Similar Builds Cache")
+    print("="*70)
+
+    memory = BackboardLegoMemory()
+    _save(memory, "dorm", "bedroom")
+    _save(memory, "dorm-2", "bedroom")
+    _save(memory, "office", "office")
+
+    results = memory.get_similar_builds("dorm", "bedroom")
+    print(f"✅ First query: {[r['project_name'] for r in results]}")
+    assert sorted(r["project_name"] for r in results) == ["dorm", "dorm-2"]
+
+    _save(memory, "dorm-3", "bedroom")
+    results = memory.get_similar_builds("dorm", "bedroom")
+    print(f"✅ After save: {[r['project_name'] for r in results]}")
+    assert len(results) == 3, "save_build must invalidate cached results"
+
+    limited = memory.get_similar_builds("dorm", "bedroom", max_results=1)
+    assert len(limited) == 1
+
+    print("\n✅ Similar builds cache test passed!")
+
+
+def test_similar_builds_batch():
+    """Batch lookup matches individual lookups, in query order"""
+    print("\n" + "="*70)
+    print("TEST: Similar Builds Batch")
+    print("="*70)
+
+    memory = BackboardLegoMemory()
+    _save(memory, "dorm", "bedroom")
+    _save(memory, "office", "office")
+
+    queries = [("office", "office"), ("dorm", None), ("office", "office")]
+    batch = memory.get_similar_builds_batch(queries)
+
+    for (project_name, room_type), results in zip(queries, batch):
+        single = memory.get_similar_builds(project_name, room_type)
+        print(f"✅ {project_name}/{room_type}: {[r['project_name'] for r in results]}")
+        assert results == single
+
+    print("\n✅ Similar builds batch test passed!")
+
+
+def test_similar_builds_room_index():
+    """Room-filtered lookups only see that room, including after import_memory"""
+    print("\n" + "="*70)
+    print("TEST: Similar Builds Room Index")
+    print("="*70)
+
+    memory = BackboardLegoMemory()
+    _save(memory, "dorm", "bedroom")
+    _save(memory, "dorm", "office")
+
+    assert [r["room_type"] for r in memory.get_similar_builds("dorm", "bedroom")] == ["bedroom"]
+    assert len(memory.get_similar_builds("dorm")) == 2
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = str(Path(tmp) / "memory.json")
+        assert memory.export_memory(filepath)
+        restored = BackboardLegoMemory()
+        assert restored.import_memory(filepath)
+
+    results = restored.get_similar_builds("dorm", "office")
+    print(f"✅ After import: {[r['room_type'] for r in results]}")
+    assert [r["room_type"] for r in results] == ["office"]
+
+    print("\n✅ Similar builds room index test passed!")
+
+
+def test_room_and_type_indexes():
+    """Room/type lookups and statistics follow saves and re-typed components"""
+    print("\n" + "="*70)
+    print("TEST: Room and Component Type Indexes")
+    print("="*70)
+
+    memory = BackboardLegoMemory()
+    _save(memory, "dorm", "bedroom")
+    _save(memory, "office", "office")
+    _save(memory, "dorm-2", "bedroom")
+    memory.add_to_component_library("c1", "desk", {}, (1, 1, 1))
+    memory.add_to_component_library("c2", "chair", {}, (1, 1, 1))
+    memory.add_to_component_library("c1", "chair", {}, (1, 1, 1))
+
+    assert [b.project_name for b in memory.get_builds_by_room("bedroom")] == ["dorm", "dorm-2"]
+    assert list(memory.get_library_by_type("chair")) == ["c2", "c1"]
+    assert memory.get_library_by_type("desk") == {}
+
+    stats = memory.get_statistics()
+    print(f"✅ Stats: {stats['builds_by_room']} {stats['components_by_type']}")
+    assert stats["builds_by_room"] == {"bedroom": 2, "office": 1}
+    assert stats["components_by_type"] == {"chair": 2}
+
+    print("\n✅ Room and component type index test passed!")
+
+
+def test_packed_voxel_data():
+    """Saved voxel dicts are packed into columns and come back unchanged"""
+    print("\n" + "="*70)
+    print("TEST: Packed Voxel Data")
+    print("="*70)
+
+    voxels = [
+        {"x": 0, "y": 1, "z": 2, "hex_color": "#FF0000"},
+        {"x": -3, "y": 4, "z": 5, "hex_color": "#00FF00"},
+        {"x": 6, "y": 7, "z": 8, "hex_color": "#FF0000"},
+    ]
+    memory = BackboardLegoMemory()
+    build_id = memory.save_build(
+        project_name="dorm",
+        voxel_data={"voxel_count": 3, "voxels": voxels},
+        manifest={"bricks": []},
+        piece_summary={"total_pieces": 0},
+        components=[],
+        room_type="bedroom"
+    )
+
+    stored = memory.get_build(build_id)
+    assert "voxels" not in stored.voxel_data
+    assert stored.voxel_data["_packed"].palette == ["#FF0000", "#00FF00"]
+    assert stored.to_dict()["voxel_data"] == {"voxel_count": 3, "voxels": voxels}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = str(Path(tmp) / "memory.json")
+        assert memory.export_memory(filepath)
+        restored = BackboardLegoMemory()
+        assert restored.import_memory(filepath)
+
+    restored_voxels = restored.get_build(build_id).to_dict()["voxel_data"]["voxels"]
+    print(f"✅ Round trip: {len(restored_voxels)} voxels")
+    assert restored_voxels == voxels
+
+    if backboard_lego_memory.MSGPACK_AVAILABLE:
+        # Export writes the packed columns as-is; voxel dicts are never rebuilt
+        unpack = backboard_lego_memory._unpack_voxel_data
+        backboard_lego_memory._unpack_voxel_data = None
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                filepath = str(Path(tmp) / "memory.msgpack")
+                assert memory.export_memory(filepath, format="msgpack")
+                backboard_lego_memory._unpack_voxel_data = unpack
+                restored = BackboardLegoMemory()
+                assert restored.import_memory(filepath, format="msgpack")
+        finally:
+            backboard_lego_memory._unpack_voxel_data = unpack
+        assert restored.get_build(build_id).to_dict() == memory.get_build(build_id).to_dict()
+        print("✅ msgpack round trip without unpacking voxels")
+
+    print("\n✅ Packed voxel data test passed!")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print("BACKBOARD MEMORY TEST SUITE (No External APIs Required)")
+    print("="*70)
+
+    try:
+        test_similar_builds_cache_invalidation()
+        test_similar_builds_batch()
+        test_similar_builds_room_index()
+        test_room_and_type_indexes()
+        test_packed_voxel_data()
+
+        print("\n" + "="*70)
+        print("✅ ALL BACKBOARD MEMORY TESTS PASSED")
+        print("="*70)
+
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script for the JSON body size limit - runs fully in memory, no external APIs
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+
+LIMIT = 1000
+URL = "/api/master-builder/process"
+HEADERS = {"content-type": "application/json"}
+# Content-types FastAPI still parses as JSON; None sends no content-type at all
+JSON_CONTENT_TYPES = ["application/json", "Application/JSON", "application/vnd.api+json", None]
+
+
+def _chunked(body: bytes, size: int = 256):
+    """Request body as a generator, so it is sent with Transfer-Encoding: chunked"""
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def _body(voxel_count: int) -> bytes:
+    # Voxels missing required fields: a delivered body fails validation with 422
+    return b'{"voxels": [' + b",".join([b'{"x": 0}'] * voxel_count) + b"]}"
+
+
+def test_json_body_limit():
+    """Oversized JSON bodies get 413 whether or not Content-Length is declared"""
+    print("="*70)
+    print("TEST: JSON Body Size Limit")
+    print("="*70)
+
+    # Imported here so a missing app dependency fails this test, not collection
+    from app import main
+
+    client = TestClient(main.app)
+    default_limit = main.MAX_JSON_BODY_BYTES
+    main.MAX_JSON_BODY_BYTES = LIMIT
+    try:
+        small, large = _body(10), _body(2000)
+        assert len(small) < LIMIT < len(large)
+
+        # Declared Content-Length
+        response = client.post(URL, content=large, headers=HEADERS)
+        print(f"✅ Content-Length {len(large)}: {response.status_code}")
+        assert response.status_code == 413
+
+        # Chunked: no Content-Length, so the received bytes are counted
+        response = client.post(URL, content=_chunked(large), headers=HEADERS)
+        print(f"✅ Chunked {len(large)}: {response.status_code}")
+        assert response.status_code == 413
+
+        # Every content-type that ends up parsed as JSON is capped, declared or chunked
+        for content_type in JSON_CONTENT_TYPES:
+            headers = {"content-type": content_type} if content_type else {}
+            for content in (large, _chunked(large)):
+                response = client.post(URL, content=content, headers=headers)
+                assert response.status_code == 413, (content_type, response.status_code)
+        print(f"✅ Capped for content-types: {JSON_CONTENT_TYPES}")
+
+        # Under the limit the buffered body reaches the endpoint unchanged
+        for content_type in JSON_CONTENT_TYPES:
+            headers = {"content-type": content_type} if content_type else {}
+            for content in (small, _chunked(small)):
+                response = client.post(URL, content=content, headers=headers)
+                assert response.status_code == 422, (content_type, response.text)
+        print("✅ Small bodies reach validation (422)")
+    finally:
+        main.MAX_JSON_BODY_BYTES = default_limit
+
+    print("\n✅ JSON body size limit test passed!")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print("BODY SIZE LIMIT TEST SUITE (No External APIs Required)")
+    print("="*70)
+
+    try:
+        test_json_body_limit()
+
+        print("\n" + "="*70)
+        print("✅ ALL BODY SIZE LIMIT TESTS PASSED")
+        print("="*70)
+
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
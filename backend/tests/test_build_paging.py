@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test script for build response paging - runs fully in memory, no external APIs
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.lego_build_endpoint import router
+
+URL = "/api/lego/build/from-threejs"
+BODY = {
+    "project_name": "Paging Test",
+    "voxels": [
+        {"x": x, "y": y, "z": z, "hex_color": "#0055BF"}
+        for x in range(8) for y in range(4) for z in range(3)
+    ]
+}
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_full_build_by_default():
+    """Without bricks_limit the response carries the whole build, as before paging"""
+    print("="*70)
+    print("TEST 1: Full Build By Default")
+    print("="*70)
+
+    data = _client().post(URL, json=BODY).json()
+    steps = data["instruction_manual"]["steps"]
+
+    assert len(data["bricks"]) == data["total_bricks"]
+    assert len(data["voxel_coverage"]) > 0
+    assert sum(len(step["bricks_in_step"]) for step in steps) == data["total_bricks"]
+    assert data["next_offset"] is None and data["next_step_offset"] is None
+    print(f"✅ {len(data['bricks'])} bricks, {len(steps)} full steps, "
+          f"{len(data['voxel_coverage'])} coverage rows")
+
+
+def test_paged_build():
+    """bricks_limit pages bricks and step summaries; the rest come from /bricks and /steps"""
+    print("\n" + "="*70)
+    print("TEST 2: Paged Build")
+    print("="*70)
+
+    client = _client()
+    data = client.post(f"{URL}?bricks_limit=2", json=BODY).json()
+    steps = data["instruction_manual"]["steps"]
+
+    assert len(data["bricks"]) == 2 and data["next_offset"] == 2
+    assert len(steps) == 2 and data["next_step_offset"] == 2
+    assert all("bricks" not in step and "bricks_in_step" not in step for step in steps)
+    assert data["voxel_coverage"] == []
+    print(f"✅ First page: 2 of {data['total_bricks']} bricks, 2 step summaries, no coverage")
+
+    # Coverage can still be requested while paging
+    data = client.post(f"{URL}?bricks_limit=2&include_voxel_coverage=true", json=BODY).json()
+    assert len(data["voxel_coverage"]) > 0
+
+    # Remaining pages come from the saved build
+    build_id = data["build_id"]
+    bricks = client.get(f"/api/lego/builds/{build_id}/bricks?offset=2&limit=1000").json()
+    assert len(data["bricks"]) + len(bricks["bricks"]) == data["total_bricks"]
+    assert bricks["next_offset"] is None
+
+    rest = client.get(f"/api/lego/builds/{build_id}/steps?offset=2&limit=1000").json()
+    assert rest["steps"][0]["step_number"] == 3
+    assert rest["total_steps"] == data["instruction_manual"]["total_steps"]
+    assert rest["next_offset"] is None
+    print(f"✅ Remaining {len(bricks['bricks'])} bricks and {len(rest['steps'])} steps paged")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print("BUILD PAGING TEST SUITE (No External APIs Required)")
+    print("="*70)
+
+    try:
+        test_full_build_by_default()
+        test_paged_build()
+
+        print("\n" + "="*70)
+        print("✅ ALL BUILD PAGING TESTS PASSED")
+        print("="*70)
+
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test script for InstructionManualGenerator - runs fully in memory, no external APIs
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.instruction_manual_generator import InstructionManualGenerator
+
+
+def _brick(part_id, x, y, z):
+    return {"part_id": part_id, "position": [x, y, z], "rotation": 0, "color_id": 1}
+
+
+def test_layer_grouping():
+    """Bricks are grouped into one step per layer, lowest layer first"""
+    print("="*70)
+    print("TEST: Layer Grouping")
+    print("="*70)
+
+    manifest = {"bricks": [
+        _brick("3001", 0, 0, 2),
+        _brick("3003", 4, 0, 0),
+        _brick("3001", 0, 2, 0),
+        _brick("3001", 2, 2, 2),
+    ]}
+    guide = InstructionManualGenerator.generate_build_guide(manifest, "test")
+
+    print(f"✅ {guide.total_steps} steps: {[step.layer_z for step in guide.steps]}")
+    assert guide.total_bricks == 4
+    assert [step.layer_z for step in guide.steps] == [0, 2]
+    assert [len(step.bricks_in_step) for step in guide.steps] == [2, 2]
+    # Bricks within a step come out in (x, y) placement order
+    assert [b["position"][:2] for b in guide.steps[0].bricks_in_step] == [[0, 2], [4, 0]]
+    assert list(guide.steps[0].piece_counts.items()) == [("3001", 1), ("3003", 1)]
+    assert guide.steps[1].piece_counts == {"3001": 2}
+    assert guide.layer_summary == {0: "Layer 0: 2 bricks placed", 2: "Layer 2: 2 bricks placed"}
+
+    # MasterBuilder manifests nest positions as {"studs": [...], "mm": [...]}
+    nested = {"bricks": [
+        {**brick, "position": {"studs": brick["position"], "mm": [0.0, 0.0, 0.0]}}
+        for brick in manifest["bricks"]
+    ]}
+    nested_guide = InstructionManualGenerator.generate_build_guide(nested, "test")
+    assert [step.instructions for step in nested_guide.steps] == [step.instructions for step in guide.steps]
+    assert "Place brick 3003 at (4, 0, 0)" in InstructionManualGenerator.export_to_html(nested_guide)
+
+    summary = InstructionManualGenerator.export_to_json(guide, include_bricks=False)
+    assert all("bricks" not in step for step in summary["steps"])
+    assert [step["brick_count"] for step in summary["steps"]] == [2, 2]
+    assert "bricks" in InstructionManualGenerator.export_to_json(guide)["steps"][0]
+
+    empty = InstructionManualGenerator.generate_build_guide({"bricks": []}, "empty")
+    assert empty.total_steps == 0 and empty.difficulty == "Easy"
+
+    print("\n✅ Layer grouping test passed!")
+
+
+def test_html_streaming():
+    """iter_html yields head, one chunk per step, footer, and matches export_to_html"""
+    print("\n" + "="*70)
+    print("TEST: HTML Streaming")
+    print("="*70)
+
+    manifest = {"bricks": [_brick("3001", x, 0, z) for x in range(3) for z in range(4)]}
+    guide = InstructionManualGenerator.generate_build_guide(manifest, "stream")
+
+    chunks = list(InstructionManualGenerator.iter_html(guide))
+    print(f"✅ {len(chunks)} chunks for {guide.total_steps} steps")
+    assert len(chunks) == guide.total_steps + 2
+    assert "".join(chunks) == InstructionManualGenerator.export_to_html(guide)
+    assert chunks[0].startswith("<!DOCTYPE html>") and chunks[-1].endswith("</html>")
+
+    # User-supplied names and part ids are escaped
+    unsafe = InstructionManualGenerator.generate_build_guide(
+        {"bricks": [_brick("<b>", 0, 0, 0)]}, "A & <script>"
+    )
+    html = InstructionManualGenerator.export_to_html(unsafe)
+    assert "<script>" not in html and "A &amp; &lt;script&gt;" in html
+    assert "&lt;b&gt;" in html
+
+    print("\n✅ HTML streaming test passed!")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print("INSTRUCTION MANUAL TEST SUITE (No External APIs Required)")
+    print("="*70)
+
+    try:
+        test_layer_grouping()
+        test_html_streaming()
+
+        print("\n" + "="*70)
+        print("✅ ALL INSTRUCTION MANUAL TESTS PASSED")
+        print("="*70)
+
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Test script for LDrawGenerator - runs fully in memory, no external APIs
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import ldraw_generator
+from app.services.ldraw_generator import LDrawGenerator, LegoVisualizerWeb, _ManifestArrays
+
+
+def _brick(part_id, x, y, z, rotation=0, color_id=5):
+    return {"part_id": part_id, "position": [x, y, z], "rotation": rotation, "color_id": color_id}
+
+
+def test_ldraw_batch():
+    """Batched LDraw conversion matches the per-brick conversion"""
+    print("="*70)
+    print("TEST: LDraw Batch Conversion")
+    print("="*70)
+
+    bricks = [
+        _brick("3001", 1, 2, 3),
+        _brick("3003", -4, 0, 1, rotation=90, color_id=13),
+        _brick("9999", 0, 0, 0),
+        _brick("3005", 2, 2, 0, rotation=45, color_id=99),
+        _brick("3004", 0, 5, 2, rotation=270),
+    ]
+    lines = list(LDrawGenerator._ldraw_from_arrays(_ManifestArrays.from_bricks(bricks)))
+    expected = [line for line in map(LDrawGenerator._brick_to_ldraw, bricks) if line]
+
+    print(f"✅ {len(lines)} lines, first: {lines[0]}")
+    assert lines == expected
+    assert lines[0] == "1 4 20 72 -40 1 0 0 0 1 0 0 0 1 3001.dat"
+    assert list(LDrawGenerator._ldraw_from_arrays(_ManifestArrays.from_bricks([]))) == []
+
+    # MasterBuilder manifests nest positions as {"studs": [...], "mm": [...]}
+    nested = [{**brick, "position": {"studs": brick["position"], "mm": [0.0, 0.0, 0.0]}} for brick in bricks]
+    assert list(LDrawGenerator._ldraw_from_arrays(_ManifestArrays.from_bricks(nested))) == lines
+
+    # Writing the .ldr file does not need python-ldraw
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = str(Path(tmp) / "model.ldr")
+        assert LDrawGenerator.generate_ldraw_file({"bricks": bricks}, output_path)
+        assert Path(output_path).read_text().splitlines()[1:] == lines
+
+        # Written in several batches, same file
+        batch = ldraw_generator.LDRAW_WRITE_BATCH
+        ldraw_generator.LDRAW_WRITE_BATCH = 2
+        try:
+            chunked_path = str(Path(tmp) / "chunked.ldr")
+            assert LDrawGenerator.generate_ldraw_file({"bricks": bricks}, chunked_path)
+        finally:
+            ldraw_generator.LDRAW_WRITE_BATCH = batch
+        assert Path(chunked_path).read_text() == Path(output_path).read_text()
+
+    print("\n✅ LDraw batch test passed!")
+
+
+def test_ldraw_fractional_and_missing_color():
+    """Fractional stud positions and missing colors convert as the per-brick path does"""
+    print("\n" + "="*70)
+    print("TEST: LDraw Fractional Positions and Missing Colors")
+    print("="*70)
+
+    missing_color = {"part_id": "3004", "position": [3, 1, 0], "rotation": 90}
+    bricks = [
+        _brick("3001", 1.5, 0.5, 2),
+        _brick("3003", 2, 1, 0.25, color_id=None),
+        missing_color,
+        _brick("3005", 0, 0, 0, rotation=90.0, color_id=13),
+    ]
+    lines = list(LDrawGenerator._ldraw_from_arrays(_ManifestArrays.from_bricks(bricks)))
+    expected = [LDrawGenerator._brick_to_ldraw(brick) for brick in bricks]
+
+    print(f"✅ {lines[:2]}")
+    assert lines == expected
+    assert lines[0] == "1 4 30.0 48 -10.0 1 0 0 0 1 0 0 0 1 3001.dat"
+    assert lines[1].startswith("1 16 40 6.0 -20 ")
+    assert lines[2].startswith("1 13 60 0 -20 0 0 1 ")
+
+    # Same fallbacks for the RGB colors: None -> default gray, missing -> color 16
+    data = LDrawGenerator.generate_3d_json({"bricks": bricks})
+    assert [brick["color_rgb"] for brick in data["bricks"][1:3]] == [[200, 200, 200], [255, 165, 0]]
+
+    print("\n✅ LDraw fractional positions and missing colors test passed!")
+
+
+def test_3d_json_colors():
+    """Colors come from the LUTs and match the per-brick color lookup"""
+    print("\n" + "="*70)
+    print("TEST: 3D JSON Colors")
+    print("="*70)
+
+    bricks = [_brick("3001", 0, 0, 0, color_id=color_id) for color_id in (5, 13, 0, 99, -1)]
+    data = LDrawGenerator.generate_3d_json({"bricks": bricks})
+
+    print(f"✅ {[brick['color_rgb'] for brick in data['bricks']]}")
+    assert data["total_bricks"] == 5
+    assert [tuple(brick["color_rgb"]) for brick in data["bricks"]] == [
+        LDrawGenerator._get_color_rgb(brick["color_id"]) for brick in bricks
+    ]
+    assert data["bricks"][0]["size"] == {"width": 32, "depth": 16, "height": 9.6}
+
+    print("\n✅ 3D JSON colors test passed!")
+
+
+def test_html_viewer_rows():
+    """The viewer embeds compact brick rows plus one copy of the color/size tables"""
+    print("\n" + "="*70)
+    print("TEST: HTML Viewer Rows")
+    print("="*70)
+
+    manifest = {"bricks": [
+        {"part_id": "3001", "position": {"studs": [1, 2, 3], "mm": [8.0, 16.0, 28.8]}, "rotation": 90, "color_id": 5},
+        _brick("3005", 0, 0, 0, color_id=99),
+    ]}
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = str(Path(tmp) / "viewer.html")
+        assert LegoVisualizerWeb.generate_html_viewer(manifest, output_path)
+        html = Path(output_path).read_text()
+
+    print(f"✅ {len(html)} bytes")
+    assert "Total Bricks: 2</p>" in html
+    assert 'const bricks = [["3001",1,2,3,90,5],["3005",0,0,0,0,0]];' in html
+    assert html.count("const COLOR_LUT = ") == 1 and html.rstrip().endswith("</html>")
+
+    print("\n✅ HTML viewer rows test passed!")
+
+
+def test_manifest_arrays_fresh():
+    """Every export reads the manifest as it is now, including in-place edits"""
+    print("\n" + "="*70)
+    print("TEST: Fresh Manifest Arrays")
+    print("="*70)
+
+    manifest = {"bricks": [_brick("3001", 0, 0, 0), _brick("3003", 2, 1, 1, color_id=13)]}
+    assert LDrawGenerator.generate_3d_json(manifest)["bricks"][1]["color_rgb"] == [0, 0, 255]
+    manifest["bricks"][1]["color_id"] = 5
+    assert LDrawGenerator.generate_3d_json(manifest)["bricks"][1]["color_rgb"] == [255, 0, 0]
+    manifest["bricks"].append(_brick("3005", 4, 4, 0))
+    assert LDrawGenerator.generate_3d_json(manifest)["total_bricks"] == 3
+    manifest["bricks"][1]["color_id"] = 13
+    del manifest["bricks"][2]
+
+    arrays = _ManifestArrays.from_manifest(manifest)
+    vertices, faces, vertex_colors = LDrawGenerator._mesh_from_arrays(arrays)
+    print(f"✅ {len(vertices)} vertices, {len(faces)} faces")
+    assert vertices.shape == (16, 3) and faces.shape == (24, 3) and faces.max() == 15
+    assert vertex_colors[8:].tolist() == [[0, 0, 255]] * 8
+
+    print("\n✅ Fresh manifest arrays test passed!")
+
+
+def test_glb_single_mesh():
+    """All bricks go into one GLB mesh of 8mm boxes (skipped without trimesh)"""
+    print("\n" + "="*70)
+    print("TEST: GLB Single Mesh")
+    print("="*70)
+
+    try:
+        import trimesh
+    except ImportError:
+        print("⚠️  trimesh not installed, skipping")
+        return
+
+    manifest = {"bricks": [_brick("3001", 0, 0, 0), _brick("3003", 2, 1, 1, color_id=13)]}
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = str(Path(tmp) / "model.glb")
+        assert LDrawGenerator.generate_glb_file(manifest, output_path)
+        mesh = trimesh.load(output_path, force="mesh")
+
+    print(f"✅ {len(mesh.vertices)} vertices, {len(mesh.faces)} faces")
+    assert len(mesh.faces) == 24
+    # GLB stores float32 vertices
+    assert abs(mesh.volume - 2 * 8 ** 3) < 1e-3
+    assert abs(mesh.bounds - [[-4.0, -4.0, -4.0], [20.0, 12.0, 13.6]]).max() < 1e-4
+
+    print("\n✅ GLB single mesh test passed!")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print("LDRAW GENERATOR TEST SUITE (No External APIs Required)")
+    print("="*70)
+
+    try:
+        test_ldraw_batch()
+        test_ldraw_fractional_and_missing_color()
+        test_3d_json_colors()
+        test_html_viewer_rows()
+        test_manifest_arrays_fresh()
+        test_glb_single_mesh()
+
+        print("\n" + "="*70)
+        print("✅ ALL LDRAW GENERATOR TESTS PASSED")
+        print("="*70)
+
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
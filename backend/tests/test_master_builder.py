@@ -11,6 +11,7 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from app.services import master_builder
 from app.services.master_builder import MasterBuilder
 
 
@@ -88,8 +89,8 @@ async def test_layered_structure():
     print(f"Layers: {manifest['layers']}")
     
     # Check that interlocking worked (different brick positions on different layers)
-    layer_0_bricks = [b for b in manifest['bricks'] if b['position'][2] == 0]
-    layer_1_bricks = [b for b in manifest['bricks'] if b['position'][2] == 1]
+    layer_0_bricks = [b for b in manifest['bricks'] if b['position']['studs'][2] == 0]
+    layer_1_bricks = [b for b in manifest['bricks'] if b['position']['studs'][2] == 1]
     
     print(f"\nLayer 0: {len(layer_0_bricks)} bricks")
     print(f"Layer 1: {len(layer_1_bricks)} bricks")
@@ -185,6 +186,83 @@ async def test_greedy_priority():
     return manifest
 
 
+def test_build_cache():
+    """Cache hits restore the full build state and never share data with other builds"""
+    print("\n" + "="*70)
+    print("TEST 5: Build Cache Hit/Miss")
+    print("="*70)
+    
+    voxels = [
+        {"x": x, "y": y, "z": z, "hex_color": "#0055BF"}
+        for x in range(5) for y in range(3) for z in range(2)
+    ]
+    master_builder._build_cache.clear()
+    
+    # Miss: real greedy run, result stored
+    first = MasterBuilder()
+    miss = first.process_voxels_sync(voxels)
+    original_color = miss["bricks"][0]["color_id"]
+    assert len(master_builder._build_cache) == 1
+    
+    # Hit: same manifest and same builder state as the real run
+    second = MasterBuilder()
+    hit = second.process_voxels_sync(voxels)
+    assert hit == miss
+    for name in master_builder._BUILD_STATE_ATTRS:
+        assert getattr(second, name) == getattr(first, name), f"{name} not restored"
+    print(f"✅ Hit restored {len(second.placed_bricks)} bricks, "
+          f"{len(second.occupied_positions)} occupied positions")
+    
+    # Editing either result must not leak into the cache or other hits
+    miss["bricks"][0]["color_id"] = 999
+    hit["bricks"][0]["color_id"] = 998
+    second.placed_bricks.clear()
+    third = MasterBuilder()
+    again = third.process_voxels_sync(voxels)
+    assert again["bricks"][0]["color_id"] == original_color
+    assert again["bricks"] is not hit["bricks"]
+    assert len(third.placed_bricks) == len(first.placed_bricks)
+    print("✅ Cached entry unaffected by edits to returned manifests")
+
+
+# Placement produced by the greedy kernel before it was rewritten to test
+# footprints in place: (part_id, position, rotation, color_id) in placement order
+GREEDY_REFERENCE_PLACEMENT = [
+    ("3004", (0, 0, 0), 90, 4), ("3004", (0, 2, 0), 90, 4), ("3005", (0, 4, 0), 0, 4),
+    ("3001", (6, 0, 0), 90, 6), ("3003", (2, 0, 0), 0, 6), ("3004", (2, 4, 0), 0, 6),
+    ("3004", (6, 4, 0), 0, 6), ("3004", (2, 2, 0), 90, 6), ("3004", (4, 0, 0), 90, 6),
+    ("3004", (8, 0, 0), 90, 6), ("3004", (8, 2, 0), 90, 6), ("3005", (4, 4, 0), 0, 6),
+    ("3005", (8, 4, 0), 0, 6), ("3001", (5, 1, 1), 0, 6), ("3001", (5, 3, 1), 0, 6),
+    ("3001", (1, 1, 1), 90, 6), ("3004", (3, 3, 1), 90, 6), ("3005", (3, 1, 1), 0, 6),
+    ("3001", (4, 0, 2), 0, 6), ("3001", (0, 0, 2), 90, 6), ("3004", (0, 4, 2), 0, 6),
+    ("3004", (4, 4, 2), 0, 6),
+]
+
+
+def test_greedy_placement_regression():
+    """The greedy kernel places the same bricks, in the same order, as the reference run"""
+    print("\n" + "="*70)
+    print("TEST 6: Greedy Placement Regression")
+    print("="*70)
+    
+    # Three two-color layers with a hole, so seams, rotations and fallbacks all matter
+    voxels = [
+        {"x": x, "y": y, "z": z, "hex_color": "#0055BF" if (x + z) % 5 else "#FF0000"}
+        for z in range(3) for x in range(9) for y in range(5)
+        if not (3 <= x <= 4 and y == 2)
+    ]
+    master_builder._build_cache.clear()
+    
+    builder = MasterBuilder()
+    builder.process_voxels_sync(voxels)
+    placement = [
+        (brick.part_id, brick.position, brick.rotation, brick.color_id)
+        for brick in builder.placed_bricks
+    ]
+    assert placement == GREEDY_REFERENCE_PLACEMENT, placement
+    print(f"✅ {len(placement)} bricks match the reference placement")
+
+
 if __name__ == "__main__":
     print("\n" + "="*70)
     print("MASTER BUILDER SERVICE - TEST SUITE")
@@ -197,6 +275,9 @@ if __name__ == "__main__":
             await test_layered_structure()
             await test_mixed_colors()
             await test_greedy_priority()
+            # Synchronous (runs its own event loop), so also collected by pytest
+            await asyncio.to_thread(test_build_cache)
+            await asyncio.to_thread(test_greedy_placement_regression)
             
             print("\n" + "="*70)
             print("✅ ALL TESTS COMPLETED")
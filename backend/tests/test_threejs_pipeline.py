@@ -17,8 +17,10 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.services.threejs_voxelizer import (
     get_sample_dorm_room_voxels,
+    get_sample_dorm_room_voxel_set,
     ThreeJsVoxelizer,
-    VoxelGrid
+    VoxelGrid,
+    VoxelSet
 )
 from app.services.master_builder import MasterBuilder
 from app.services.backboard_lego_memory import BackboardLegoMemory
@@ -53,6 +55,23 @@ def test_dorm_room_voxelization():
     return voxels
 
 
+def test_voxel_set_round_trip():
+    """Test 1b: VoxelSet columns match the voxel dicts"""
+    print("\n" + "="*70)
+    print("TEST 1b: Voxel Grid → VoxelSet (SoA)")
+    print("="*70)
+    
+    voxels = get_sample_dorm_room_voxels(resolution=0.15)
+    voxel_set = get_sample_dorm_room_voxel_set(resolution=0.15)
+    
+    print(f"✓ {len(voxel_set)} voxels, {len(voxel_set.palette)} palette colors")
+    assert voxel_set.to_dicts() == voxels
+    assert VoxelSet.from_dicts(voxels).to_dicts() == voxels
+    assert voxel_set.to_dicts(limit=5) == voxels[:5]
+    assert voxel_set.rgb.tolist() == [int(v["hex_color"].lstrip("#"), 16) for v in voxels]
+    print("✓ Round trip matches the dict path")
+
+
 def test_lego_generation(voxels):
     """Test 2: Generate LEGO manifest from voxels"""
     print("\n" + "="*70)
@@ -191,6 +210,36 @@ def test_complete_pipeline():
         return None
 
 
+def test_pipeline_rejects_non_object_items():
+    """Test 5: Non-object scene objects / voxels get 422, not a 500 from deep in the pipeline"""
+    print("\n" + "="*70)
+    print("TEST 5: Pipeline Input Validation")
+    print("="*70)
+    
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.threejs_pipeline import router
+    
+    app = FastAPI()
+    app.include_router(router)
+    app.state.backboard_memory = BackboardLegoMemory()
+    client = TestClient(app)
+    
+    for url, field in (("/api/lego/threejs-to-backboard", "objects"),
+                       ("/api/lego/voxels-to-backboard", "voxels")):
+        for bad_item in ([1, 2], "box", 7, None):
+            response = client.post(url, json={field: [{}, bad_item]})
+            assert response.status_code == 422, (url, bad_item, response.status_code)
+            assert response.json()["detail"].startswith(f"{field}[1] must be an object")
+        print(f"✓ {url}: non-object {field} rejected with 422")
+    
+    response = client.post("/api/lego/voxels-to-backboard", json={
+        "voxels": [{"x": 0, "y": 0, "z": 0, "hex_color": "#FF0000"}]
+    })
+    assert response.status_code == 200, response.text
+    print("✓ Valid voxels still processed")
+
+
 def save_test_results(results_dict):
     """Save test results to JSON file"""
     output_path = Path(__file__).parent / "threejs_pipeline_results.json"
@@ -211,6 +260,7 @@ if __name__ == "__main__":
     # Test 1: Voxelization
     voxels = test_dorm_room_voxelization()
     results["voxelization"] = {"voxel_count": len(voxels), "status": "passed"}
+    test_voxel_set_round_trip()
     
     # Test 2: LEGO Generation
     manifest = test_lego_generation(voxels)
@@ -237,6 +287,9 @@ if __name__ == "__main__":
     else:
         results["complete_pipeline"] = {"status": "failed"}
     
+    # Test 5: Input validation
+    test_pipeline_rejects_non_object_items()
+    
     # Save results
     save_test_results(results)
     
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script for copying video uploads to disk - runs fully in memory/tmp, no external APIs
+"""
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.api import endpoints
+
+PAYLOAD = os.urandom(3 * endpoints.UPLOAD_CHUNK_SIZE + 123)
+
+
+def _copy(src) -> bytes:
+    with tempfile.TemporaryFile() as dst:
+        size = endpoints._copy_upload(src, dst)
+        dst.flush()
+        dst.seek(0)
+        data = dst.read()
+    assert size == len(data)
+    return data
+
+
+def test_copy_disk_backed_upload():
+    """A spooled upload that rolled to disk is copied byte for byte"""
+    print("="*70)
+    print("TEST 1: Disk-Backed Upload")
+    print("="*70)
+
+    with tempfile.SpooledTemporaryFile(max_size=1024) as src:
+        src.write(PAYLOAD)
+        src.seek(0)
+        assert _copy(src) == PAYLOAD
+    print(f"✅ Copied {len(PAYLOAD)} bytes on {sys.platform}")
+
+
+def test_copy_without_fileno():
+    """File objects without a file descriptor fall back to the chunked copy"""
+    print("\n" + "="*70)
+    print("TEST 2: Upload Without fileno")
+    print("="*70)
+
+    assert _copy(io.BytesIO(PAYLOAD)) == PAYLOAD
+    print("✅ BytesIO copied in chunks")
+
+
+def test_sendfile_failure_falls_back():
+    """A sendfile error mid-copy is discarded and the chunked copy takes over"""
+    print("\n" + "="*70)
+    print("TEST 3: sendfile Failure")
+    print("="*70)
+
+    real_sendfile = getattr(os, "sendfile", None)
+
+    def failing_sendfile(out_fd, in_fd, offset, count):
+        # Write part of the data, then fail like an unsupported file system would
+        os.write(out_fd, b"partial")
+        raise OSError("sendfile not supported")
+
+    os.sendfile = failing_sendfile
+    try:
+        with tempfile.TemporaryFile() as src:
+            src.write(PAYLOAD)
+            src.seek(0)
+            assert _copy(src) == PAYLOAD
+    finally:
+        if real_sendfile is None:
+            del os.sendfile
+        else:
+            os.sendfile = real_sendfile
+    print("✅ Partial sendfile output discarded, chunked copy complete")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*70)
+    print("UPLOAD COPY TEST SUITE (No External APIs Required)")
+    print("="*70)
+
+    try:
+        test_copy_disk_backed_upload()
+        test_copy_without_fileno()
+        test_sendfile_failure_falls_back()
+
+        print("\n" + "="*70)
+        print("✅ ALL UPLOAD COPY TESTS PASSED")
+        print("="*70)
+
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)